@@ -0,0 +1,73 @@
+"""
+Benchmark for transliterate_file() with and without mmap=True.
+
+Writes a synthetic corpus to a temporary file and converts it with each mode in a
+fresh process, reporting throughput in MB/s and the peak resident size of the process
+(read from /proc, so Linux only). The outputs are checked to be identical.
+
+    python benchmarks/bench_file.py                  # 256 MB file
+    python benchmarks/bench_file.py --size 2048      # 2 GB file
+"""
+import argparse
+import filecmp
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from bench_transliterate import CORPUS_BLOCK, synthetic_corpus  # noqa: E402
+
+# Run in a child process, so each mode's peak resident size is its own. VmHWM is
+# read instead of ru_maxrss, which a child inherits from the process that forked it.
+CHILD = """
+import re, sys, time
+sys.path.insert(0, {root!r})
+from singlish import get_matcher, transliterate_file
+get_matcher()
+start = time.perf_counter()
+transliterate_file({src!r}, {dst!r}, mmap={mmap})
+seconds = time.perf_counter() - start
+with open("/proc/self/status") as status:
+    print(seconds, re.search(r"VmHWM:\\s*(\\d+)", status.read()).group(1))
+"""
+
+
+def run_mode(src: str, dst: str, mmap: bool):
+    """Return (seconds, peak resident size in KiB) of converting src with one mode."""
+    output = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, src=src, dst=dst, mmap=mmap)],
+                            check=True, capture_output=True, text=True).stdout
+    seconds, peak = output.split()
+    return float(seconds), int(peak)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=256, help="size of the test file in MB (default: 256)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        src = os.path.join(directory, "corpus.txt")
+        block = synthetic_corpus(CORPUS_BLOCK).encode("utf-8")
+        with open(src, "wb") as file:
+            for _ in range(max(1, (args.size << 20) // len(block))):
+                file.write(block)
+        size = os.path.getsize(src)
+
+        outputs = []
+        for mmap in (False, True):
+            dst = os.path.join(directory, f"out-{mmap}.txt")
+            seconds, peak = run_mode(src, dst, mmap)
+            outputs.append(dst)
+            print(f"{'mmap' if mmap else 'str':<6} {size / seconds / 1e6:>10,.1f} MB/s   peak RSS {peak / 1024:>8,.1f} MiB")
+        if not filecmp.cmp(*outputs, shallow=False):
+            print("The outputs differ")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Benchmark for IncrementalTransliterator.update() against a full transliterate().
+
+Types a few characters at the start, in the middle and at the end of documents of
+several sizes, the way the typing window sees them, and reports the mean time per
+edit next to one full transliteration of the document. Every result is checked
+against transliterate().
+
+    python benchmarks/bench_incremental.py                        # 6 KB, 60 KB and 600 KB documents
+    python benchmarks/bench_incremental.py --sizes 60000 --edits 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singlish import IncrementalTransliterator, transliterate  # noqa: E402
+
+from bench_transliterate import natural_text  # noqa: E402
+
+# Typed one character at a time at each place, then deleted again
+TYPED = "mama gedara yanawa "
+
+
+def time_edits(document: str, at: int, edits: int):
+    """Mean seconds per update() while typing and deleting TYPED at offset `at`."""
+    transliterator = IncrementalTransliterator()
+    transliterator.update(document)
+    versions = []
+    while len(versions) < edits:
+        for end in list(range(1, len(TYPED) + 1)) + list(range(len(TYPED) - 1, -1, -1)):
+            versions.append(document[:at] + TYPED[:end] + document[at:])
+    versions = versions[:edits]
+    start = time.perf_counter()
+    for version in versions:
+        transliterator.update(version)
+    seconds = (time.perf_counter() - start) / len(versions)
+    return seconds, transliterator.output == transliterate(versions[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6000, 60000, 600000],
+                        help="document sizes in characters (default: 6000 60000 600000)")
+    parser.add_argument("--edits", type=int, default=500, help="edits timed at each place (default: 500)")
+    args = parser.parse_args(argv)
+
+    transliterate(TYPED)  # Load the matcher before anything is timed
+    failed = False
+    for size in args.sizes:
+        document = natural_text(size)
+        start = time.perf_counter()
+        transliterate(document)
+        full = time.perf_counter() - start
+        line = f"{size:>9,} chars   full {full * 1e3:>8.3f} ms"
+        for name, at in (("start", 0), ("middle", size // 2), ("end", size)):
+            seconds, correct = time_edits(document, at, args.edits)
+            failed |= not correct
+            line += f"   {name} {seconds * 1e3:>7.3f} ms"
+        print(line)
+    if failed:
+        print("update() results differ from transliterate()")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark for transliterate_many() against a plain loop over transliterate().
+
+Builds columns of short strings the way data pipelines see them and reports texts
+per second for the loop, for transliterate_many() and, with --processes, for its
+multiprocessing mode. The results are checked to be identical, and if NumPy or
+pandas is installed, so are those of an array and a Series in every mode.
+
+    python benchmarks/bench_many.py                          # 1,000,000 texts per column
+    python benchmarks/bench_many.py --count 10000000 --processes 8
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singlish import transliterate, transliterate_many  # noqa: E402
+
+SYLLABLES = ["ka", "ma", "sa", "na", "ra", "la", "thi", "dha", "wi", "ku", "mu", "ni", "ri",
+             "pa", "ga", "ja", "yaa", "lii", "suu", "nu", "de", "go", "hee", "wa"]
+
+
+def columns(count: int, seed: int = 1):
+    """Yield (name, texts) for columns with many, some and few repeated texts."""
+    rng = random.Random(seed)
+
+    def word():
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+    first = [word().capitalize() for _ in range(800)]
+    last = [word().capitalize() for _ in range(1500)]
+    vocabulary = [word() for _ in range(5000)]
+    towns = [word().capitalize() for _ in range(300)]
+    yield "towns", [rng.choice(towns) for _ in range(count)]
+    yield "names", [f"{rng.choice(first)} {rng.choice(last)}" for _ in range(count)]
+    yield "titles", [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 8))) for _ in range(count)]
+
+
+def container_failures(texts, processes: int):
+    """
+    Names of the containers transliterate_many() gets wrong: a 2-D NumPy array and a
+    pandas Series with a custom index, whichever of the two libraries is installed.
+    """
+    expected = transliterate_many(list(texts))
+    failures = []
+    chunk_size = max(1, len(texts) // 4)  # Several chunks, also for a short column
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None and len(texts) % 2 == 0:
+        array = numpy.array(texts, dtype=object).reshape(2, -1)
+        result = transliterate_many(array, processes=processes, chunk_size=chunk_size)
+        if not isinstance(result, numpy.ndarray) or result.shape != array.shape or result.ravel().tolist() != expected:
+            failures.append("ndarray")
+    try:
+        import pandas
+    except ImportError:
+        pandas = None
+    if pandas is not None:
+        series = pandas.Series(texts, index=range(len(texts), 0, -1), name="texts")
+        result = transliterate_many(series, processes=processes, chunk_size=chunk_size)
+        if (not isinstance(result, pandas.Series) or result.tolist() != expected
+                or not result.index.equals(series.index) or result.name != series.name):
+            failures.append("Series")
+    return failures
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000000, help="texts per column (default: 1000000)")
+    parser.add_argument("--processes", type=int, default=0, help="also time the multiprocessing mode")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name, texts in columns(args.count):
+        expected, loop = timed(lambda: [transliterate(text) for text in texts])
+        result, many = timed(transliterate_many, texts)
+        line = (f"{name:<8} {len(set(texts)) / len(texts):>6.1%} distinct   loop {len(texts) / loop:>12,.0f} texts/s   "
+                f"many {len(texts) / many:>12,.0f} texts/s ({loop / many:.1f}x)")
+        failed |= result != expected
+        if args.processes > 1:
+            result, pooled = timed(transliterate_many, texts, processes=args.processes)
+            line += f"   {args.processes} processes {len(texts) / pooled:>12,.0f} texts/s ({loop / pooled:.1f}x)"
+            failed |= result != expected
+        print(line)
+        for processes in sorted({1, args.processes}):
+            for container in container_failures(texts[:10000], processes):
+                print(f"{name}: transliterate_many() of a {container} with processes={processes} is wrong")
+                failed = True
+    if failed:
+        print("transliterate_many() results differ from the loop")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Load generator for `python -m singlish serve`.
+
+Opens a number of keep-alive connections and sends short transliteration requests
+on all of them as fast as the server answers, then reports requests per second and
+latency percentiles. With --spawn the server is started and stopped by the script.
+
+    python benchmarks/bench_server.py --spawn                     # start a server and load it
+    python benchmarks/bench_server.py --port 8765 --connections 256 --duration 30
+    python benchmarks/bench_server.py --spawn --batch 20          # 20 texts per request
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from bench_transliterate import SENTENCES, SHORT_WORDS, percentile  # noqa: E402
+from singlish_server import DEFAULT_PORT  # noqa: E402
+
+
+def request_bytes(host: str, body: dict) -> bytes:
+    data = json.dumps(body).encode("utf-8")
+    return (f"POST /transliterate HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode("latin-1") + data
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    """Read one response and return its status code."""
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host: str, port: int, requests, deadline: float, latencies: list, errors: list):
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(rng.choice(requests))
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(host: str, port: int, connections: int, duration: float, batch: int):
+    texts = SHORT_WORDS + SENTENCES
+    rng = random.Random(1)
+    if batch > 1:
+        requests = [request_bytes(host, {"texts": rng.choices(texts, k=batch)}) for _ in range(100)]
+    else:
+        requests = [request_bytes(host, {"text": text}) for text in texts]
+    latencies: list = []
+    errors: list = []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(host, port, requests, deadline, latencies, errors)
+                           for _ in range(connections)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on {host}:{port} did not start within {timeout:g} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--connections", type=int, default=64, help="concurrent connections (default: 64)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (default: 10)")
+    parser.add_argument("--batch", type=int, default=1, help="texts per request (default: 1)")
+    parser.add_argument("--spawn", action="store_true", help="start a server for the run")
+    parser.add_argument("--workers", type=int, help="worker processes of the spawned server")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn:
+        command = [sys.executable, "-m", "singlish", "serve", "--host", args.host, "--port", str(args.port)]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+        server = subprocess.Popen(command, cwd=ROOT)
+    try:
+        wait_for_port(args.host, args.port)
+        latencies, errors, elapsed = asyncio.run(
+            load(args.host, args.port, args.connections, args.duration, args.batch))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(f"{len(latencies):,} requests in {elapsed:.1f} s over {args.connections} connections")
+    print(f"{len(latencies) / elapsed:,.0f} requests/s, {len(latencies) * args.batch / elapsed:,.0f} texts/s")
+    if latencies:
+        print(f"latency p50 {percentile(latencies, 0.50) * 1000:.2f} ms   "
+              f"p90 {percentile(latencies, 0.90) * 1000:.2f} ms   "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    if errors:
+        print(f"{len(errors)} requests failed")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
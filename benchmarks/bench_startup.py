@@ -0,0 +1,117 @@
+"""
+Startup benchmarks.
+
+Each measurement starts a fresh process several times and reports the median wall
+clock time, so import, table loading and window construction costs are all included.
+The GUI is also timed from launch to the first paint of its window, on Qt's offscreen
+platform, and that time is checked against a cold start budget. After the paint it
+times its first transliteration, which loads the matcher, so a frozen build shows
+whether its bundled table is used.
+
+    python benchmarks/bench_startup.py                          # engine and `python singlish_gui_qt.py`
+    python benchmarks/bench_startup.py --budget 250             # fail if the first paint takes longer
+    python benchmarks/bench_startup.py --frozen "dist/SinglishQt 2.10/SinglishQt 2.10.exe"
+    python build_app.py && python benchmarks/bench_startup.py --frozen "dist/SinglishQt 2.10/SinglishQt 2.10"
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds from launching `python singlish_gui_qt.py` to the first paint of its window
+GUI_BUDGET_MS = 200
+
+# First call to transliterate(), with and without the precompiled table
+ENGINE_CASES = {
+    "import": "import singlish",
+    "first_call_table": "import singlish; singlish.transliterate('mama')",
+    "first_call_no_table": "import singlish; singlish.TABLE_PATH = ''; singlish.transliterate('mama')",
+}
+
+
+def time_command(command, runs, env=None):
+    """Median wall clock seconds of running command to completion."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def gui_env():
+    env = dict(os.environ, SINGLISH_EXIT_AFTER_STARTUP="1")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def time_first_paint(command, runs):
+    """
+    Median (wall clock seconds, milliseconds to first paint, milliseconds of the first
+    transliteration) of launching the GUI.
+    """
+    times = []
+    paints = []
+    calls = []
+    for _ in range(runs):
+        env = gui_env()
+        start = time.perf_counter()
+        env["SINGLISH_STARTUP_TIME"] = repr(time.time())
+        result = subprocess.run(command, cwd=ROOT, env=env, check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        times.append(time.perf_counter() - start)
+        for line in result.stdout.splitlines():
+            if line.startswith("first_paint_ms "):
+                paints.append(float(line.split()[1]))
+            elif line.startswith("first_call_ms "):
+                calls.append(float(line.split()[1]))
+    return (statistics.median(times), statistics.median(paints) if paints else None,
+            statistics.median(calls) if calls else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="process launches per measurement (default: 10)")
+    parser.add_argument("--frozen", help="path of a PyInstaller build of singlish_gui_qt.py to time as well")
+    parser.add_argument("--budget", type=float, default=GUI_BUDGET_MS,
+                        help=f"milliseconds allowed until the GUI's first paint (default: {GUI_BUDGET_MS})")
+    args = parser.parse_args(argv)
+
+    baseline = time_command([sys.executable, "-c", "pass"], args.runs)
+    print(f"{'python -c pass':<24} {baseline * 1000:8.1f} ms")
+    for name, code in ENGINE_CASES.items():
+        elapsed = time_command([sys.executable, "-c", code], args.runs)
+        print(f"{name:<24} {elapsed * 1000:8.1f} ms  ({(elapsed - baseline) * 1000:+.1f} ms over bare Python)")
+
+    commands = {}
+    try:
+        import PyQt6  # noqa: F401
+    except ImportError:
+        print("PyQt6 is not installed, skipping the GUI startup")
+    else:
+        commands["singlish_gui_qt.py"] = [sys.executable, "singlish_gui_qt.py"]
+    if args.frozen:
+        commands["frozen build"] = [args.frozen]
+
+    over_budget = False
+    for name, command in commands.items():
+        elapsed, first_paint, first_call = time_first_paint(command, args.runs)
+        line = f"{name:<24} {elapsed * 1000:8.1f} ms"
+        if first_paint is not None:
+            line += f"  first paint {first_paint:.1f} ms (budget {args.budget:g} ms)"
+            over_budget |= first_paint > args.budget
+        if first_call is not None:
+            line += f"  first transliteration {first_call:.1f} ms"
+        print(line)
+    if over_budget:
+        print("Cold start is over budget")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
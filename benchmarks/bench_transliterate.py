@@ -0,0 +1,221 @@
+"""
+Benchmarks for the transliteration engine in singlish.py.
+
+Every case reports throughput in chars/s, per-call latency percentiles and the peak
+memory allocated by one call. Results are written as JSON and can be compared against
+a stored baseline, failing when a case gets slower or uses more memory than allowed.
+Cases without a baseline entry are reported with a warning.
+
+    python benchmarks/bench_transliterate.py                      # run and compare with baseline.json
+    python benchmarks/bench_transliterate.py --large              # include the 100 MB corpus
+    python benchmarks/bench_transliterate.py --update-baseline    # store the results as the new baseline
+    python benchmarks/bench_transliterate.py --update-baseline --only mixed_1mb    # refresh one entry
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singlish import TRANSLITERATION_MAP, TokenCache, detransliterate, transliterate, transliterate_bytes  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Separators placed between words of the synthetic corpora
+SEPARATORS = [" "] * 12 + [", ", ". ", "\n", "? "]
+
+SHORT_WORDS = ["mama", "oyaa", "eka", "nae", "gedhara", "yanawa", "kaeema", "api", "heta", "lankaawa"]
+SENTENCES = [
+    "mama gedara yanawa",
+    "oyaa kohedha inne?",
+    "api heta udheta kaeema kanna yamu",
+    "mata adha wadaa godak thiyenawa, passe kathaa karamu",
+]
+
+
+# Larger corpora repeat a random block of this size instead of generating every word
+CORPUS_BLOCK = 4 << 20
+
+
+def synthetic_corpus(size: int, seed: int = 1) -> str:
+    """Random text of `size` characters made of the map's own keys."""
+    rng = random.Random(seed)
+    keys = list(TRANSLITERATION_MAP)
+    words = ["".join(rng.choice(keys) for _ in range(rng.randint(1, 4))) for _ in range(5000)]
+    pieces = []
+    length = 0
+    while length < min(size, CORPUS_BLOCK):
+        piece = rng.choice(words) + rng.choice(SEPARATORS)
+        pieces.append(piece)
+        length += len(piece)
+    block = "".join(pieces)
+    return (block * (size // len(block) + 1))[:size]
+
+
+def natural_text(size: int, seed: int = 1) -> str:
+    """Text of `size` characters built from everyday sentences, so words repeat a lot."""
+    rng = random.Random(seed)
+    sentences = SENTENCES + [" ".join(rng.sample(SHORT_WORDS, 5)) for _ in range(50)]
+    block = "".join(rng.choice(sentences) + rng.choice(SEPARATORS) for _ in range(20000))
+    return (block * (size // len(block) + 1))[:size]
+
+
+def punctuation_run(size: int) -> str:
+    """Long runs of characters that start no key."""
+    return ("... !!! ??? --- 12345 ,,, ;;; " * (size // 30 + 1))[:size]
+
+
+def escape_run(size: int) -> str:
+    """English written entirely with //X escapes."""
+    return ("//H//e//l//l//o //W//o//r//l//d " * (size // 32 + 1))[:size]
+
+
+def mixed_text(size: int, seed: int = 1) -> str:
+    """Sentences mixed with URLs, numbers, `code` and English words written with escapes."""
+    rng = random.Random(seed)
+    extras = ["https://example.com/docs?page=2", "www.example.lk", "`pip install singlish`", "2024-06-01",
+              "//P//y//t//h//o//n", "//W//i//F//i", "`x = 1`", "12,500"]
+    block = " ".join(rng.choice(SENTENCES) if rng.random() < 0.6 else rng.choice(extras) for _ in range(20000))
+    return (block * (size // len(block) + 1))[:size]
+
+
+def cases(large: bool):
+    """Yield (name, make_inputs, repeats, function) for every benchmark case."""
+    yield "short_words", lambda: SHORT_WORDS, 2000, transliterate
+    yield "sentences", lambda: SENTENCES, 1000, transliterate
+    yield "corpus_1mb", lambda: [synthetic_corpus(1 << 20)], 5, transliterate
+    if large:
+        yield "corpus_100mb", lambda: [synthetic_corpus(100 << 20)], 1, transliterate
+    yield "natural_1mb", lambda: [natural_text(1 << 20)], 5, transliterate
+    yield "natural_1mb_bytes", lambda: [natural_text(1 << 20).encode("utf-8")], 5, transliterate_bytes
+    yield "natural_1mb_cached", lambda: [natural_text(1 << 20)], 5, TokenCache().transliterate
+    yield "punctuation_1mb", lambda: [punctuation_run(1 << 20)], 5, transliterate
+    yield "escapes_1mb", lambda: [escape_run(1 << 20)], 5, transliterate
+    yield "mixed_1mb", lambda: [mixed_text(1 << 20)], 5, transliterate
+    yield "mixed_1mb_protected", lambda: [mixed_text(1 << 20)], 5, lambda text: transliterate(text, protect=True)
+    yield "reverse_natural_1mb", lambda: [transliterate(natural_text(1 << 20))], 5, detransliterate
+    yield "reverse_corpus_1mb", lambda: [transliterate(synthetic_corpus(1 << 20))], 5, detransliterate
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_case(inputs, repeats, function=transliterate):
+    """Time `function` over the inputs and measure the peak memory of the largest call."""
+    # Warm up, so one-off costs such as compiling the matcher are not counted
+    function(inputs[0])
+
+    latencies = []
+    chars = 0
+    for _ in range(repeats):
+        for text in inputs:
+            start = time.perf_counter_ns()
+            function(text)
+            latencies.append(time.perf_counter_ns() - start)
+            chars += len(text)
+    total = sum(latencies) / 1e9
+
+    tracemalloc.start()
+    function(max(inputs, key=len))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "chars": chars,
+        "chars_per_s": chars / total if total else 0.0,
+        "latency_us": {
+            "p50": percentile(latencies, 0.50) / 1e3,
+            "p90": percentile(latencies, 0.90) / 1e3,
+            "p99": percentile(latencies, 0.99) / 1e3,
+        },
+        "peak_memory_bytes": peak,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the regression messages for the cases present in both result sets, and the
+    names of the cases the baseline has no entry for.
+    """
+    regressions = []
+    missing = []
+    for name, result in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            missing.append(name)
+            continue
+        if result["chars_per_s"] < base["chars_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['chars_per_s']:,.0f} chars/s, "
+                               f"baseline {base['chars_per_s']:,.0f} chars/s")
+        if result["peak_memory_bytes"] > base["peak_memory_bytes"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {result['peak_memory_bytes']:,} bytes, "
+                               f"baseline {base['peak_memory_bytes']:,} bytes")
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--large", action="store_true", help="include the 100 MB corpus")
+    parser.add_argument("--only", nargs="*", help="run only the named cases")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown or memory growth as a fraction (default: 0.25)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {},
+    }
+    for name, make_inputs, repeats, function in cases(args.large):
+        if args.only and name not in args.only:
+            continue
+        result = run_case(make_inputs(), repeats, function)
+        results["cases"][name] = result
+        latency = result["latency_us"]
+        print(f"{name:<16} {result['chars_per_s']:>14,.0f} chars/s   "
+              f"p50 {latency['p50']:>10,.1f} us   p99 {latency['p99']:>10,.1f} us   "
+              f"peak {result['peak_memory_bytes'] / 1024:>10,.0f} KiB")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.update_baseline:
+        if args.only and os.path.exists(args.baseline):
+            # Keep the entries of the cases that were not run
+            with open(args.baseline) as file:
+                results["cases"] = {**json.load(file)["cases"], **results["cases"]}
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against.")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions, missing = compare(results, baseline, args.tolerance)
+    for name in missing:
+        print(f"WARNING {name}: not in the baseline, not compared (see --update-baseline)")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions against the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
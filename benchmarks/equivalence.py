@@ -0,0 +1,194 @@
+"""
+Equivalence checks for the fast paths of the transliteration engine.
+
+Random text made of the map's keys, runs of // escapes and characters that start no
+key is fed to each fast path, and the result must be exactly what the original
+engine, which tried every key length at every position, gives for the same text:
+
+    matcher     transliterate() against the original loop
+    edits       IncrementalTransliterator.update() over random edit sequences
+    chunks      the str, bytes and memory-mapped streaming paths, cut at random places
+    cache       TokenCache, small enough that words keep being evicted
+
+    python benchmarks/equivalence.py                           # 20,000 samples per check
+    python benchmarks/equivalence.py --samples 200000 --seed 7 --check matcher
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singlish import (IncrementalTransliterator, TRANSLITERATION_MAP, TokenCache, get_matcher,  # noqa: E402
+                      transliterate, transliterate_bytes, transliterate_bytes_stream, transliterate_file,
+                      transliterate_stream)
+
+# Text placed between keys: separators, characters that start or continue no key, and
+# a character outside the Basic Multilingual Plane
+SEPARATORS = [" ", " ", "\n", ".", ",", "/", "//", "1", "?", "Ä", "\U0001F600"]
+
+# The //X escape keys, strung together into runs
+ESCAPES = [key for key in TRANSLITERATION_MAP if key.startswith("//")]
+
+
+def reference_transliterate(text: str) -> str:
+    """The original engine: at each position try every key length from 8 down to 1."""
+    result = []
+    i = 0
+    while i < len(text):
+        for length in range(8, 0, -1):
+            piece = text[i:i + length]
+            if len(piece) == length and piece in TRANSLITERATION_MAP:
+                result.append(TRANSLITERATION_MAP[piece])
+                i += length
+                break
+        else:
+            result.append(text[i])
+            i += 1
+    return "".join(result)
+
+
+def random_text(rng: random.Random, keys, pieces: int = 30) -> str:
+    """Up to `pieces` random keys, separators and runs of escapes."""
+    parts = []
+    for _ in range(rng.randint(0, pieces)):
+        kind = rng.random()
+        if kind < 0.7:
+            parts.append(rng.choice(keys))
+        elif kind < 0.9:
+            parts.append(rng.choice(SEPARATORS))
+        else:
+            parts.append("".join(rng.choice(ESCAPES) for _ in range(rng.randint(1, 5))))
+    return "".join(parts)
+
+
+def check_matcher(rng: random.Random, keys):
+    text = random_text(rng, keys)
+    if transliterate(text) != reference_transliterate(text):
+        return text, "transliterate() differs from the original loop"
+    return None
+
+
+def check_edits(rng: random.Random, keys):
+    """
+    Type, paste and delete at random places, with blocks small enough that the edits
+    cross block boundaries, and check the returned change as well as the output.
+    """
+    transliterator = IncrementalTransliterator()
+    transliterator.BLOCK_SIZE = rng.choice([2, 4, 128])
+    text = ""
+    output = ""
+    for _ in range(20):
+        start = rng.randint(0, len(text))
+        end = rng.randint(start, min(len(text), start + rng.choice([0, 0, 1, 3, 10, 100])))
+        inserted = random_text(rng, keys, rng.choice([1, 1, 3, 30]))
+        text = text[:start] + inserted + text[end:]
+        if rng.random() < 0.03:
+            text = ""
+        change_start, removed, change = transliterator.update(text)
+        output = output[:change_start] + change + output[change_start + removed:]
+        expected = reference_transliterate(text)
+        if transliterator.output != expected:
+            return text, "update() output differs from the original loop"
+        if output != expected:
+            return text, "the change returned by update() does not give the output"
+    return None
+
+
+def random_chunks(rng: random.Random, data):
+    """Cut a str or bytes into pieces at random places, empty pieces included."""
+    cuts = sorted(rng.randint(0, len(data)) for _ in range(rng.randint(0, 8)))
+    return [data[start:end] for start, end in zip([0] + cuts, cuts + [len(data)])]
+
+
+def check_chunks(rng: random.Random, keys):
+    """
+    Streams get chunks cut anywhere, bytes chunks also inside a character. About one
+    sample in 50 also goes through transliterate_file() both ways with a small chunk size.
+    """
+    text = "".join(random_text(rng, keys) for _ in range(rng.randint(1, 10)))
+    expected = reference_transliterate(text)
+    data = text.encode("utf-8")
+    if "".join(transliterate_stream(random_chunks(rng, text))) != expected:
+        return text, "transliterate_stream() differs from the original loop"
+    if transliterate_bytes(data) != expected.encode("utf-8"):
+        return text, "transliterate_bytes() differs from the original loop"
+    if b"".join(transliterate_bytes_stream(random_chunks(rng, data))) != expected.encode("utf-8"):
+        return text, "transliterate_bytes_stream() differs from the original loop"
+    output = []
+    chars = get_matcher().transliterate_mapped(data, output.append, rng.randint(1, 64))
+    if b"".join(output) != expected.encode("utf-8") or chars != len(text):
+        return text, "transliterate_mapped() differs from the original loop"
+    if rng.random() < 0.02:
+        with tempfile.TemporaryDirectory() as directory:
+            src, dst = os.path.join(directory, "in.txt"), os.path.join(directory, "out.txt")
+            with open(src, "wb") as file:
+                file.write(data)
+            for mmap in (False, True):
+                transliterate_file(src, dst, rng.randint(1, 64), mmap=mmap)
+                with open(dst, "rb") as file:
+                    if file.read() != expected.encode("utf-8"):
+                        return text, f"transliterate_file(mmap={mmap}) differs from the original loop"
+    return None
+
+
+# Shared by every sample, so later samples hit words cached by earlier ones
+_token_cache = TokenCache(maxsize=64)
+
+
+def check_cache(rng: random.Random, keys):
+    """Text from a small vocabulary, so most words are cache hits and some evictions."""
+    words = [random_text(rng, keys, 3) for _ in range(3)] + [rng.choice(keys) for _ in range(3)]
+    text = "".join(rng.choice(words) + rng.choice(SEPARATORS) for _ in range(rng.randint(0, 20)))
+    if _token_cache.transliterate(text) != reference_transliterate(text):
+        return text, "TokenCache differs from the original loop"
+    return None
+
+
+CHECKS = {
+    "matcher": check_matcher,
+    "edits": check_edits,
+    "chunks": check_chunks,
+    "cache": check_cache,
+}
+
+
+def run(name: str, samples: int, seed: int, show: int):
+    """Return the failing (text, problem) examples of one check, at most `show` of them, and the failure count."""
+    rng = random.Random(f"{seed}-{name}")
+    keys = list(TRANSLITERATION_MAP)
+    check = CHECKS[name]
+    failures = []
+    count = 0
+    for _ in range(samples):
+        failure = check(rng, keys)
+        if failure:
+            count += 1
+            if len(failures) < show:
+                failures.append(failure)
+    return failures, count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20000, help="random samples per check (default: 20000)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--show", type=int, default=5, help="failing examples to print per check (default: 5)")
+    parser.add_argument("--check", choices=sorted(CHECKS), action="append",
+                        help="run only this check; may be given more than once (default: all)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.check or CHECKS:
+        failures, count = run(name, args.samples, args.seed, args.show)
+        for text, problem in failures:
+            print(f"{name}: {text!r}: {problem}")
+        print(f"{name:<12} {count} of {args.samples} samples failed")
+        failed |= count > 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
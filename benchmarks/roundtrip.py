@@ -0,0 +1,99 @@
+"""
+Round-trip property check for detransliterate().
+
+Random Singlish is transliterated to Sinhala, turned back into Singlish and
+transliterated again; the Sinhala must come out unchanged. The streaming variant
+is fed the same Sinhala cut at random places and must agree with the one-shot call.
+Both directions are timed on the same text at the end.
+
+    python benchmarks/roundtrip.py                    # 100,000 random samples
+    python benchmarks/roundtrip.py --samples 1000000 --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singlish import (TRANSLITERATION_MAP, detransliterate, detransliterate_stream,  # noqa: E402
+                      transliterate)
+
+# Text placed between keys, including a few characters that start or continue no key
+SEPARATORS = [""] * 20 + [" "] * 4 + [".", ",", "\n", "/", "1", "?"]
+
+
+def random_singlish(rng: random.Random, keys) -> str:
+    """A short run of random keys and separators."""
+    return "".join(rng.choice(keys) + rng.choice(SEPARATORS) for _ in range(rng.randint(1, 12)))
+
+
+def random_chunks(rng: random.Random, text: str):
+    """Cut text into a few pieces at random places, empty pieces included."""
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 4)))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+def check(samples: int, seed: int, show: int):
+    """Return the failing (singlish, sinhala, back, problem) examples, at most `show` of them, and the failure count."""
+    rng = random.Random(seed)
+    keys = list(TRANSLITERATION_MAP)
+    failures = []
+    count = 0
+    for _ in range(samples):
+        singlish = random_singlish(rng, keys)
+        sinhala = transliterate(singlish)
+        back = detransliterate(sinhala)
+        problem = None
+        if transliterate(back) != sinhala:
+            problem = f"reads back as {transliterate(back)!r}"
+        elif "".join(detransliterate_stream(random_chunks(rng, sinhala))) != back:
+            problem = "streaming result differs"
+        if problem:
+            count += 1
+            if len(failures) < show:
+                failures.append((singlish, sinhala, back, problem))
+    return failures, count
+
+
+def throughput(seed: int, size: int = 1 << 20):
+    """Chars/s of transliterate() and detransliterate() over the same random text."""
+    rng = random.Random(seed)
+    keys = list(TRANSLITERATION_MAP)
+    pieces = []
+    length = 0
+    while length < size:
+        piece = random_singlish(rng, keys) + " "
+        pieces.append(piece)
+        length += len(piece)
+    singlish = "".join(pieces)
+    start = time.perf_counter()
+    sinhala = transliterate(singlish)
+    forward = time.perf_counter() - start
+    start = time.perf_counter()
+    detransliterate(sinhala)
+    reverse = time.perf_counter() - start
+    return len(singlish) / forward, len(sinhala) / reverse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100000, help="random samples to check (default: 100000)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--show", type=int, default=20, help="failing examples to print (default: 20)")
+    args = parser.parse_args(argv)
+
+    failures, count = check(args.samples, args.seed, args.show)
+    for singlish, sinhala, back, problem in failures:
+        print(f"{singlish!r} -> {sinhala!r} -> {back!r}: {problem}")
+    print(f"{count} of {args.samples} samples failed to round-trip")
+
+    forward, reverse = throughput(args.seed)
+    print(f"transliterate   {forward:>14,.0f} chars/s")
+    print(f"detransliterate {reverse:>14,.0f} chars/s")
+    return 1 if count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,25 @@
 import PyInstaller.__main__
 import os
+import singlish
 
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Precompile the transliteration matcher so the app does not build it on first use
+table_path = os.path.join(current_dir, singlish.TABLE_FILE)
+singlish.build_table(table_path)
+
 PyInstaller.__main__.run([
     'singlish_gui_qt.py',  # Your main script
     '--onedir',        # Create a directory-based executable (faster startup)
     '--windowed',       # Run without console window
     '--icon=iconmr.ico',  # Multi-resolution icon for the executable
     '--name=SinglishQt 2.10',  # Name of the output executable
-    f'--add-data={os.path.join(current_dir, "iconmr.ico")};.',  # Include the icon file
-    f'--add-data={os.path.join(current_dir, "check-focus.png")};resources',  # Include the checkbox checked style file
-    f'--add-data={os.path.join(current_dir, "check-unsel-dis.png")};resources',  # Include the checkbox unchecked style file
-    f'--add-data={os.path.join(current_dir, "LICENSE.txt")};.',  # Include the LICENSE.txt file in the main directory
+    f'--add-data={os.path.join(current_dir, "iconmr.ico")}{os.pathsep}.',  # Include the icon file
+    f'--add-data={os.path.join(current_dir, "check-focus.png")}{os.pathsep}resources',  # Include the checkbox checked style file
+    f'--add-data={os.path.join(current_dir, "check-unsel-dis.png")}{os.pathsep}resources',  # Include the checkbox unchecked style file
+    f'--add-data={os.path.join(current_dir, "LICENSE.txt")}{os.pathsep}.',  # Include the LICENSE.txt file in the main directory
+    f'--add-data={table_path}{os.pathsep}.',  # Include the precompiled transliteration table
     '--clean',          # Clean PyInstaller cache
     '--noconfirm'       # Replace output directory without asking
 ])
\ No newline at end of file
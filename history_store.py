@@ -0,0 +1,459 @@
+import atexit
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+# Entries are keyed by a hash of their text, so the unique index holds 16 bytes per
+# entry instead of a copy of the text. Texts of COMPRESS_MIN or more UTF-8 bytes are
+# kept zlib-compressed in body, with text left NULL.
+HISTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash BLOB UNIQUE NOT NULL,
+    text TEXT,
+    body BLOB,
+    source TEXT,
+    created REAL,
+    last_used REAL
+)
+"""
+COMPRESS_MIN = 512
+COMPRESS_LEVEL = 1  # Several times faster than zlib's default, and Sinhala text still shrinks to a fraction
+
+# Every entry's text, whichever column holds it. history_inflate() is registered on
+# each connection the store opens; see _open().
+TEXT_VIEW = """
+CREATE VIEW IF NOT EXISTS history_text AS
+    SELECT id, history_inflate(text, body) AS text, source FROM history
+"""
+
+# Full-text index over the Sinhala text and the romanised source it was typed as.
+# It is an external-content FTS5 table over history_text, so the text itself is only
+# stored in history. New entries are indexed by the writer, which still has their
+# text uncompressed (see _write_add()); the triggers keep the index in step with
+# every update and delete. Updates that leave text and source as they were, such as
+# of last_used alone, leave it alone.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE history_fts USING fts5(
+    text, source, content='history_text', content_rowid='id', prefix='1 2 3'
+);
+"""
+SEARCH_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, text, source)
+        VALUES ('delete', old.id, history_inflate(old.text, old.body), old.source);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE OF text, body, source ON history
+WHEN old.text IS NOT new.text OR old.body IS NOT new.body OR old.source IS NOT new.source BEGIN
+    INSERT INTO history_fts (history_fts, rowid, text, source)
+        VALUES ('delete', old.id, history_inflate(old.text, old.body), old.source);
+    INSERT INTO history_fts (rowid, text, source) VALUES (new.id, history_inflate(new.text, new.body), new.source);
+END;
+"""
+
+
+# Queue items besides writes: ask the writer to commit now, and to commit and stop
+_COMMIT = "commit"
+_STOP = "stop"
+
+
+def content_hash(text):
+    """The key of a history entry: a 16 byte hash of its text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def pack(text):
+    """Return the (text, body) columns for an entry, compressing a large text into body."""
+    data = text.encode("utf-8")
+    if len(data) >= COMPRESS_MIN:
+        body = zlib.compress(data, COMPRESS_LEVEL)
+        if len(body) < len(data):
+            return None, body
+    return text, None
+
+
+def unpack(text, body):
+    """The text of an entry from its (text, body) columns."""
+    return text if body is None else zlib.decompress(body).decode("utf-8")
+
+
+def search_query(text):
+    """Turn search box input into an FTS5 query matching every word as a prefix."""
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in text.split())
+
+
+class HistoryStore:
+    """
+    Typing history kept in SQLite, independent of any window.
+    The application opens one store at startup and keeps it for its whole lifetime.
+    Writes are queued for a background thread that owns the writing connection and
+    commits them in groups, so saving history only costs the caller a queue put.
+    Reads use a connection of their own, once the writes queued before them are in.
+
+    A retention policy keeps the database from growing forever: entries beyond
+    MAX_ROWS or MAX_BYTES are dropped least recently used first, and entries unused
+    for MAX_AGE_DAYS are dropped too (0 turns a limit off). The writer applies it at
+    startup and every MAINTENANCE_WRITES writes, then compacts the file if deleted
+    entries left much of it empty.
+    """
+    DB_FILE = "history.db"  # SQLite database file
+    SCHEMA_VERSION = 4  # Stored in PRAGMA user_version, see migrate()
+    COMMIT_BATCH = 50  # Commit once this many writes are pending
+    COMMIT_DELAY = 2.0  # Or once the oldest pending write is this many seconds old
+    QUEUE_SIZE = 10000  # Writes waiting for the writer; callers wait when it is full
+    MAX_ROWS = 10000  # Entries kept at most
+    MAX_BYTES = 16 << 20  # Bytes of text and source kept at most, as stored after compression
+    MAX_AGE_DAYS = 365  # Entries not used for this long are dropped
+    MAINTENANCE_WRITES = 1000  # Apply the retention policy again after this many writes
+    DELETE_BATCH = 500  # Entries deleted per transaction when the policy drops many
+    VACUUM_FREE_FRACTION = 0.25  # Compact once this much of the file is free pages
+
+    def __init__(self, path=DB_FILE, max_rows=None, max_bytes=None, max_age_days=None):
+        self.path = path
+        # None keeps the class default
+        self.max_rows = self.MAX_ROWS if max_rows is None else max_rows
+        self.max_bytes = self.MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age_days = self.MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.conn = None  # Reading connection, opened by the first read
+        self.searchable = False  # Set by the writer once it has created the search index
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._closed = False
+        # The database is opened and migrated on the writer thread too, so not even the
+        # first write waits for it
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+        # A daemon thread dies with the interpreter; make sure queued writes are saved first
+        atexit.register(self.close)
+
+    def _open(self):
+        """Connect to the database, with the SQL functions the schema uses."""
+        conn = sqlite3.connect(self.path)
+        conn.create_function("history_inflate", 2, unpack, deterministic=True)
+        return conn
+
+    def _connect(self):
+        """Open the writing connection and bring the database up to date."""
+        conn = self._open()
+        # Write-ahead logging lets readers and the writer work without blocking each other,
+        # and with synchronous=NORMAL a commit no longer waits for a full fsync
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(HISTORY_TABLE.format(name="history"))
+        conn.commit()
+        self.migrate(conn)
+        conn.execute(TEXT_VIEW)
+        self.searchable = self.create_search_index(conn)
+        return conn
+
+    def migrate(self, conn):
+        """Upgrade a database written by an older version in place."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 3:
+            # Before version 3 the full-text index read the history table itself. It is
+            # dropped here, which also spares it the updates below, and create_search_index()
+            # builds it again over history_text.
+            for trigger in ("history_fts_insert", "history_fts_delete", "history_fts_update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("DROP TABLE IF EXISTS history_fts")
+        if version < 1:
+            # Version 1 stores the romanised text each entry was typed as
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+            if "source" not in columns:
+                conn.execute("ALTER TABLE history ADD COLUMN source TEXT")
+        if version < 2:
+            # Version 2 records when each entry was added and last used, for the retention policy
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+            for column in ("created", "last_used"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE history ADD COLUMN {column} REAL")
+            # Older entries have no times; they count from the upgrade, so none expires at once
+            now = time.time()
+            conn.execute("UPDATE history SET created = ?, last_used = ? WHERE created IS NULL", (now, now))
+            conn.execute("CREATE INDEX IF NOT EXISTS history_last_used ON history (last_used)")
+        if version < 3:
+            # Version 3 keys entries by content_hash() and compresses large texts
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+            if "hash" not in columns:
+                self.rebuild_table(conn)
+        if version < 4:
+            # Version 4 indexes new entries without a trigger, and re-indexes an entry
+            # only if an update changes it; create_search_index() adds the new triggers
+            conn.execute("DROP TRIGGER IF EXISTS history_fts_insert")
+            conn.execute("DROP TRIGGER IF EXISTS history_fts_update")
+        conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.commit()
+
+    def rebuild_table(self, conn):
+        """
+        Copy a table keyed by its text into the version 3 layout, keeping every id. SQLite
+        cannot drop the UNIQUE index of a column, so the table is written anew and renamed.
+        """
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'history'").fetchone()
+        conn.execute(HISTORY_TABLE.format(name="history_v3"))
+        rows = conn.execute("SELECT id, text, source, created, last_used FROM history")
+        while True:
+            batch = rows.fetchmany(self.DELETE_BATCH)
+            if not batch:
+                break
+            conn.executemany("""
+                INSERT OR IGNORE INTO history_v3 (id, hash, text, body, source, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(item_id, content_hash(text), *pack(text), source, created, last_used)
+                  for item_id, text, source, created, last_used in batch])
+        conn.execute("DROP VIEW IF EXISTS history_text")
+        conn.execute("DROP TABLE history")
+        conn.execute("ALTER TABLE history_v3 RENAME TO history")
+        if sequence:
+            # Ids of deleted entries are never handed out again, as before
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'history'", sequence)
+        conn.execute("CREATE INDEX IF NOT EXISTS history_last_used ON history (last_used)")
+
+    def create_search_index(self, conn):
+        """
+        Create the full-text index if it does not exist yet, indexing any existing rows.
+        Returns False if this SQLite build has no FTS5, in which case search falls back to LIKE.
+        """
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'history_fts'").fetchone():
+            conn.executescript(SEARCH_TRIGGERS)
+            return True
+        try:
+            conn.executescript(SEARCH_SCHEMA + SEARCH_TRIGGERS)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search is not available: {e}")
+            return False
+        conn.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+        conn.commit()
+        return True
+
+    def enforce_retention(self, conn):
+        """
+        Delete the entries the retention policy drops, DELETE_BATCH per transaction.
+        Returns the number of entries deleted.
+        """
+        doomed = set()
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            doomed.update(row[0] for row in conn.execute("SELECT id FROM history WHERE last_used < ?", (cutoff,)))
+        if self.max_rows:
+            excess = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] - self.max_rows
+            if excess > 0:
+                doomed.update(row[0] for row in conn.execute(
+                    "SELECT id FROM history ORDER BY last_used, id LIMIT ?", (excess,)))
+        if self.max_bytes:
+            size = ("IFNULL(LENGTH(CAST(text AS BLOB)), 0) + IFNULL(LENGTH(body), 0)"
+                    " + IFNULL(LENGTH(CAST(source AS BLOB)), 0)")
+            excess = (conn.execute(f"SELECT SUM({size}) FROM history").fetchone()[0] or 0) - self.max_bytes
+            if excess > 0:
+                for item_id, item_size in conn.execute(f"SELECT id, {size} FROM history ORDER BY last_used, id"):
+                    doomed.add(item_id)
+                    excess -= item_size
+                    if excess <= 0:
+                        break
+        doomed = sorted(doomed)
+        for start in range(0, len(doomed), self.DELETE_BATCH):
+            conn.executemany("DELETE FROM history WHERE id = ?",
+                             [(item_id,) for item_id in doomed[start:start + self.DELETE_BATCH]])
+            conn.commit()
+        return len(doomed)
+
+    def maintain(self, conn):
+        """Apply the retention policy, and compact the database once much of it is free pages."""
+        try:
+            self.enforce_retention(conn)
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if pages and free >= pages * self.VACUUM_FREE_FRACTION:
+                conn.execute("VACUUM")
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            print(f"Error compacting history: {e}")
+
+    def _write_loop(self):
+        """
+        Run queued writes on the writer thread. Writes are committed together once
+        COMMIT_BATCH of them are pending or the oldest is COMMIT_DELAY seconds old,
+        and at once when a commit, flush or close asks for it.
+        """
+        try:
+            conn = self._connect()
+            self.maintain(conn)
+        except sqlite3.Error as e:
+            print(f"Error opening history: {e}")
+            conn = None  # Keep draining the queue, so callers never wait on a full one
+        pending = 0
+        deadline = None
+        writes = 0  # Since the retention policy was last applied
+        while True:
+            try:
+                item = self._queue.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = _COMMIT
+            if isinstance(item, tuple):
+                sql, params, many, error = item
+                try:
+                    if conn is not None:
+                        if callable(sql):
+                            sql(conn, *params)
+                        else:
+                            (conn.executemany if many else conn.execute)(sql, params)
+                        pending += 1
+                        writes += 1
+                except sqlite3.Error as e:
+                    print(f"{error}: {e}")
+                if pending == 1:
+                    deadline = time.monotonic() + self.COMMIT_DELAY
+                if pending < self.COMMIT_BATCH:
+                    continue
+            if pending:
+                try:
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error saving history: {e}")
+                pending = 0
+                deadline = None
+                if writes >= self.MAINTENANCE_WRITES:
+                    self.maintain(conn)
+                    writes = 0
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item == _STOP:
+                if conn is not None:
+                    try:
+                        conn.execute("PRAGMA optimize")  # Recommended before closing a connection
+                    except sqlite3.Error:
+                        pass
+                    conn.close()
+                return
+
+    def _put(self, sql, params=(), many=False, error="Error writing history"):
+        """
+        Queue one write for the writer thread. sql may also be a function, which the
+        writer calls with its connection and params, so work such as hashing and
+        compressing a text is done on that thread too.
+        """
+        if self._closed:
+            print(f"{error}: the history store is closed")
+            return
+        self._queue.put((sql, params, many, error))
+
+    def _reader(self):
+        """The reading connection, once every write queued so far has been committed."""
+        self.flush()
+        if self.conn is None:
+            self.conn = self._open()
+        return self.conn
+
+    def add(self, text, source=None):
+        """
+        Add a single history item, optionally with the romanised text it was typed as.
+        Adding a duplicate marks it used now and fills in its source if it had none.
+        """
+        self._put(self._write_add, (text, source, time.time(), True), error="Error adding history item")
+
+    def add_many(self, items):
+        """Add several history items at once."""
+        items = list(items)
+        if items:
+            self._put(self._write_many, (items, time.time()), error="Error adding history items")
+
+    def _write_add(self, conn, text, source, now, use=False):
+        """
+        Insert an entry on the writer thread, indexing it from the text in hand instead
+        of decompressing it again. With use=True a duplicate is marked used now and gets
+        the source if it had none; otherwise it is left as it is.
+        """
+        key = content_hash(text)
+        if use:
+            cursor = conn.execute("UPDATE history SET last_used = ?, source = COALESCE(source, ?) WHERE hash = ?",
+                                  (now, source, key))
+            if cursor.rowcount:
+                return
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO history (hash, text, body, source, created, last_used) VALUES (?, ?, ?, ?, ?, ?)
+        """, (key, *pack(text), source, now, now))
+        if cursor.rowcount and self.searchable:
+            conn.execute("INSERT INTO history_fts (rowid, text, source) VALUES (?, ?, ?)",
+                         (cursor.lastrowid, text, source))
+
+    def _write_many(self, conn, items, now):
+        for item in items:
+            self._write_add(conn, item, None, now)
+
+    def touch(self, text):
+        """Mark a history item as used now, so the retention policy keeps it longer."""
+        now = time.time()
+        self._put(lambda conn: conn.execute("UPDATE history SET last_used = ? WHERE hash = ?", (now, content_hash(text))),
+                  error="Error updating history item")
+
+    def get_all(self):
+        """Retrieve all history items."""
+        return [unpack(*row) for row in self._reader().execute("SELECT text, body FROM history")]
+
+    def get_page(self, before_id=None, limit=100, search=""):
+        """
+        Retrieve up to `limit` (id, text) rows, newest first, starting below before_id.
+        Paging by id keeps every page an index range scan however long the history is.
+        With a search string only rows whose Sinhala text or romanised source contain
+        words starting with every word of the search are returned.
+        """
+        conn = self._reader()
+        conditions = []
+        params = []
+        if before_id is not None:
+            conditions.append("history.id < ?")
+            params.append(before_id)
+        if search.split():
+            if self.searchable:
+                conditions.append("history.id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+                params.append(search_query(search))
+            else:
+                for word in search.split():
+                    conditions.append("(history_inflate(history.text, history.body) LIKE ? OR history.source LIKE ?)")
+                    params += [f"%{word}%"] * 2
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = conn.execute(f"SELECT history.id, history.text, history.body FROM history {where} "
+                              "ORDER BY history.id DESC LIMIT ?", params + [limit])
+        return [(item_id, unpack(text, body)) for item_id, text, body in cursor]
+
+    def delete(self, text):
+        """Delete a specific history item."""
+        self._put(lambda conn: conn.execute("DELETE FROM history WHERE hash = ?", (content_hash(text),)),
+                  error="Error deleting history item")
+
+    def delete_id(self, item_id):
+        """Delete the history item with the given id."""
+        self._put("DELETE FROM history WHERE id = ?", (item_id,), error="Error deleting history item")
+
+    def clear(self):
+        """Delete every history item."""
+        self._put("DELETE FROM history", error="Error clearing history")
+        self.commit()
+
+    def commit(self):
+        """Ask the writer to commit pending writes now, without waiting for it."""
+        if not self._closed:
+            self._queue.put(_COMMIT)
+
+    def flush(self):
+        """Commit pending writes and wait until they are in the database."""
+        if self._closed or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Commit every queued write, stop the writer and close the connections."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
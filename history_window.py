@@ -1,15 +1,142 @@
-import sqlite3
-from functools import partial
-from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QWidget, QApplication
-from PyQt6.QtGui import QFont
-from PyQt6.QtCore import Qt
-from styles import LIGHT_MODE_STYLE, DARK_MODE_STYLE  # Import styles
+from PyQt6.QtWidgets import (
+    QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QWidget, QApplication, QListView,
+    QStyledItemDelegate, QAbstractItemView, QLineEdit
+)
+from PyQt6.QtGui import QFont, QColor, QPen
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QEvent, QTimer, pyqtSignal
+from styles import LIGHT_MODE_HISTORY_STYLE, DARK_MODE_HISTORY_STYLE  # Import styles
+from history_store import HistoryStore
+
+class HistoryModel(QAbstractListModel):
+    """List model over the history store that loads rows a page at a time as the view scrolls."""
+    PAGE_SIZE = 100
+    IdRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = []  # (id, text) pairs loaded so far, newest first
+        self.exhausted = False
+        self.search = ""  # Only rows matching this search are loaded
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.rows[index.row()][1]
+        if role == self.IdRole:
+            return self.rows[index.row()][0]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        before_id = self.rows[-1][0] if self.rows else None
+        page = self.store.get_page(before_id, self.PAGE_SIZE, self.search)
+        if len(page) < self.PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def remove_row(self, row):
+        """Delete one history item from the store and drop only its row from the model."""
+        self.store.delete_id(self.rows[row][0])
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+
+    def reload(self):
+        """Forget the loaded rows and start again from the newest page."""
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+
+    def set_search(self, search):
+        """Show only the history items matching search, loading them a page at a time."""
+        self.search = search
+        self.reload()
+
+class HistoryItemDelegate(QStyledItemDelegate):
+    """Paints a history row as a bordered text box with Copy and Delete buttons, without any child widgets."""
+    ROW_HEIGHT = 60
+    BUTTON_WIDTH = 80
+    BUTTON_HEIGHT = 30
+    SPACING = 10
+
+    copy_requested = pyqtSignal(QModelIndex)
+    delete_requested = pyqtSignal(QModelIndex)
+
+    def __init__(self, dark_mode, parent=None):
+        super().__init__(parent)
+        self.dark_mode = dark_mode
+        self.text_font = QFont("Arial", 12)
+        self.button_font = QFont("Arial", 10)
+
+    def button_rects(self, rect):
+        """Rectangles of the Copy and Delete buttons inside a row."""
+        top = rect.top() + (rect.height() - self.BUTTON_HEIGHT) // 2
+        delete_rect = QRect(rect.right() - self.BUTTON_WIDTH, top, self.BUTTON_WIDTH, self.BUTTON_HEIGHT)
+        copy_rect = delete_rect.translated(-(self.BUTTON_WIDTH + self.SPACING), 0)
+        return copy_rect, delete_rect
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(0, self.SPACING // 2, 0, -self.SPACING // 2)
+        copy_rect, delete_rect = self.button_rects(option.rect)
+        text_rect = QRect(rect.left(), rect.top(), copy_rect.left() - self.SPACING - rect.left(), rect.height())
+
+        # Text box, matching the bordered labels of the old widget-per-row layout
+        painter.setPen(QPen(QColor("#555555" if self.dark_mode else "#CCCCCC")))
+        painter.drawRect(text_rect.adjusted(0, 0, -1, -1))
+        painter.setFont(self.text_font)
+        painter.setPen(QColor("white" if self.dark_mode else "black"))
+        inner = text_rect.adjusted(10, 0, -10, 0)
+        text = " ".join(index.data().split())
+        elided = painter.fontMetrics().elidedText(text, Qt.TextElideMode.ElideRight, inner.width())
+        painter.drawText(inner, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, elided)
+
+        # Buttons, in the colours of the QPushButton styles
+        painter.setFont(self.button_font)
+        for button_rect, label in ((copy_rect, "Copy"), (delete_rect, "Delete")):
+            painter.fillRect(button_rect, QColor("#444444" if self.dark_mode else "#E0E0E0"))
+            painter.setPen(QColor("white" if self.dark_mode else "black"))
+            painter.drawText(button_rect, Qt.AlignmentFlag.AlignCenter, label)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            copy_rect, delete_rect = self.button_rects(option.rect)
+            position = event.position().toPoint()
+            if copy_rect.contains(position):
+                self.copy_requested.emit(index)
+                return True
+            if delete_rect.contains(position):
+                self.delete_requested.emit(index)
+                return True
+        return super().editorEvent(event, model, option, index)
 
 class HistoryWindow(QWidget):  # History window using QWidget
-    DB_FILE = "history.db"  # SQLite database file
+    DB_FILE = HistoryStore.DB_FILE  # SQLite database file
+    SEARCH_DELAY_MS = 150  # Wait this long after the last keystroke before searching
 
-    def __init__(self, history, dark_mode):
+    def __init__(self, history, dark_mode, store=None):
         super().__init__()
+        # Use the application's history store if one is given, otherwise open our own
+        self.store = store
+        self.owns_store = store is None
+
         self.setWindowTitle("History")
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Window)
         self.setGeometry(200, 100, 800, 600)  # Set window size
@@ -52,12 +179,51 @@ class HistoryWindow(QWidget):  # History window using QWidget
 
         self.main_layout.addWidget(self.title_bar)
 
-        # History content
+        # History content: a list view that only creates and paints the visible rows
         self.history_widget = QWidget(self)
         self.history_layout = QVBoxLayout(self.history_widget)
         self.history_layout.setContentsMargins(30, 30, 30, 30)
         self.history_layout.setObjectName("history_widget_container")  # Match the style name
 
+        # Search box, matching both the Sinhala text and the Singlish it was typed as
+        self.search_box = QLineEdit(self.history_widget)
+        self.search_box.setPlaceholderText("Search history")
+        self.search_box.setFont(QFont("Arial", 12))
+        self.search_box.setClearButtonEnabled(True)
+        self.history_layout.addWidget(self.search_box)
+
+        # Search once typing pauses instead of on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.populate_history)
+        self.search_box.textChanged.connect(self.search_timer.start)
+
+        self.history_model = HistoryModel(self.store, self)
+        self.history_delegate = HistoryItemDelegate(dark_mode, self)
+        self.history_delegate.copy_requested.connect(
+            lambda index: self.copy_to_clipboard(index.data()))
+        self.history_delegate.delete_requested.connect(
+            lambda index: self.history_model.remove_row(index.row()))
+
+        self.history_view = QListView(self.history_widget)
+        self.history_view.setModel(self.history_model)
+        self.history_view.setItemDelegate(self.history_delegate)
+        self.history_view.setUniformItemSizes(True)  # Row heights are fixed, so layout never measures rows
+        self.history_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.history_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.history_view.setStyleSheet("QListView { border: none; background: transparent; }")
+        self.history_layout.addWidget(self.history_view)
+
+        # Display a message when no history is available
+        self.no_history_label = QLabel("No history available.", self.history_widget)
+        self.no_history_label.setFont(QFont("Arial", 12))
+        self.no_history_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.history_layout.addWidget(self.no_history_label)
+        for signal in (self.history_model.rowsInserted, self.history_model.rowsRemoved,
+                       self.history_model.modelReset):
+            signal.connect(self.update_empty_state)
+
         self.populate_history()
 
         self.main_layout.addWidget(self.history_widget)
@@ -76,112 +242,63 @@ class HistoryWindow(QWidget):  # History window using QWidget
         self._drag_start_position = None  # Store initial mouse position
 
     def init_db(self):
-        """Initialize the SQLite database and create the history table if it doesn't exist."""
-        if not hasattr(self, 'conn') or not self.conn:
-            self.conn = sqlite3.connect(self.DB_FILE)
-            self.cursor = self.conn.cursor()
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    text TEXT UNIQUE NOT NULL
-                )
-            """)
-            self.conn.commit()
+        """Open the history store unless the application passed one in."""
+        if self.store is None:
+            self.store = HistoryStore(self.DB_FILE)
 
     def add_history_items(self, items):
         """Add multiple history items to the database."""
-        for item in items:
-            self.add_history_item(item)
+        self.store.add_many(items)
 
     def add_history_item(self, text):
         """Add a single history item to the database."""
-        try:
-            self.cursor.execute("INSERT OR IGNORE INTO history (text) VALUES (?)", (text,))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error adding history item: {e}")
+        self.store.add(text)
 
     def get_all_history(self):
         """Retrieve all history items from the database."""
-        self.cursor.execute("SELECT text FROM history")
-        return [row[0] for row in self.cursor.fetchall()]
+        return self.store.get_all()
 
     def delete_history_item(self, text):
         """Delete a specific history item from the database."""
-        try:
-            self.cursor.execute("DELETE FROM history WHERE text = ?", (text,))
-            self.conn.commit()
-            self.populate_history()  # Refresh the UI
-        except sqlite3.Error as e:
-            print(f"Error deleting history item: {e}")
+        self.store.delete(text)
+        self.populate_history()  # Refresh the UI
 
     def clear_all_history(self):
         """Clear all history items from the database."""
-        try:
-            self.cursor.execute("DELETE FROM history")
-            self.conn.commit()
-            self.populate_history()  # Refresh the UI
-        except sqlite3.Error as e:
-            print(f"Error clearing history: {e}")
+        self.store.clear()
+        self.populate_history()  # Refresh the UI
 
     def populate_history(self):
-        """Populate the history UI with items from the database."""
-        # Clear existing layout
-        for i in reversed(range(self.history_layout.count())):
-            widget = self.history_layout.itemAt(i).widget()
-            if widget:
-                widget.deleteLater()
-
-        history = self.get_all_history()
-        if history:
-            for item in history:
-                item_layout = QHBoxLayout()  # Layout for each history item
-                label = QLabel(item, self.history_widget)
-                label.setFont(QFont("Arial", 12))
-                label.setWordWrap(True)
-                label.setStyleSheet(
-                    "border: 1px solid #ccc; padding: 10px;" if not self.dark_mode else
-                    "border: 1px solid #555; padding: 10px; color: white;"
-                )
-                item_layout.addWidget(label)
-
-                copy_button = QPushButton("Copy", self.history_widget)
-                copy_button.setFont(QFont("Arial", 10))
-                copy_button.setFixedSize(80, 30)
-                copy_button.clicked.connect(partial(self.copy_to_clipboard, item))
-                item_layout.addWidget(copy_button)
-
-                delete_button = QPushButton("Delete", self.history_widget)
-                delete_button.setFont(QFont("Arial", 10))
-                delete_button.setFixedSize(80, 30)
-                delete_button.clicked.connect(partial(self.delete_history_item, item))
-                item_layout.addWidget(delete_button)
-
-                self.history_layout.addLayout(item_layout)
-        else:
-            # Display a message when no history is available
-            no_history_label = QLabel("No history available.", self.history_widget)
-            no_history_label.setFont(QFont("Arial", 12))
-            no_history_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.history_layout.addWidget(no_history_label)
+        """Reload the history list from the newest item; further pages load as the list is scrolled."""
+        self.search_timer.stop()
+        self.history_model.set_search(self.search_box.text())
+        if self.history_model.canFetchMore():
+            self.history_model.fetchMore()
+        self.update_empty_state()
+
+    def update_empty_state(self):
+        """Show the "No history available." message instead of the list when it is empty."""
+        empty = self.history_model.rowCount() == 0 and not self.history_model.canFetchMore()
+        self.history_view.setVisible(not empty)
+        self.no_history_label.setText("No matching history." if self.history_model.search.strip()
+                                      else "No history available.")
+        self.no_history_label.setVisible(empty)
 
     def copy_to_clipboard(self, text):
         QApplication.clipboard().setText(text)
+        self.store.touch(text)  # Copying an item counts as using it for the retention policy
 
     def closeEvent(self, event):
-        """Ensure the database connection is closed when the window is closed."""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        """Close the history store if this window opened it, otherwise just have pending writes committed."""
+        if self.owns_store:
+            self.store.close()
+        else:
+            self.store.commit()
         super().closeEvent(event)
 
     def apply_styling(self, dark_mode):
         """Apply light or dark mode styles with a border."""
-        border_style = "border: 2px solid black;" if not dark_mode else "border: 2px solid white;"
-        self.setStyleSheet(f"""
-            QWidget#main_widget_container {{
-                {border_style}
-            }}
-        """ + (DARK_MODE_STYLE if dark_mode else LIGHT_MODE_STYLE))
+        self.setStyleSheet(DARK_MODE_HISTORY_STYLE if dark_mode else LIGHT_MODE_HISTORY_STYLE)
 
     def mousePressEvent(self, event):
         """Handle mouse press event to start dragging."""
@@ -1,4 +1,20 @@
-from typing import Dict
+import codecs
+import mmap
+import os
+import re
+import struct
+import sys
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import _sre  # The regex engine's internals, which table files store programs for
+except ImportError:
+    _sre = None
 
 # Create a dictionary to map English letters and combinations to Sinhala letters
 # Make this a module-level constant for better performance
@@ -11,7 +27,7 @@ TRANSLITERATION_MAP: Dict[str, str] = {
     'k': 'ක්', 'ka': 'ක', 'kaa': 'කා', 'kA': 'කැ', 'kAa': 'කෑ', 'ki': 'කි', 'kii': 'කී', 'ku': 'කු', 'kuu': 'කූ', 'k/R': 'කෘ', 'k/Rr': 'කෲ', 'ke': 'කෙ', 'kea': 'කේ', 'kI': 'කෛ', 'ko': 'කො', 'koe': 'කෝ',
     'kau': 'කෞ', 'ka/n': 'කං', 'ka/h': 'කඃ', 'kra': 'ක්‍ර', 'kraa': 'ක්‍රා', 'krA': 'ක්‍රැ', 'krAa': 'ක්‍රෑ', 'kri': 'ක්‍රි', 'krii': 'ක්‍රී', 'kru': 'කෘ', 'kruu': 'කෲ', 'kre': 'ක්‍රෙ', 'krea': 'ක්‍රේ', 'kro': 'ක්‍රො', 'kroe': 'ක්‍රෝ',
     'K': 'ඛ්', 'Ka': 'ඛ', 'Kaa': 'ඛා', 'KA': 'ඛැ', 'KAa': 'ඛෑ', 'Ki': 'ඛි', 'Kii': 'ඛී', 'Ku': 'ඛු', 'Kuu': 'ඛූ', 'K/R': 'ඛෘ', 'K/Rr': 'ඛෲ', 'Ke': 'ඛෙ', 'Kea': 'ඛේ', 'KI': 'ඛෛ', 'Ko': 'ඛො', 'Koe': 'ඛෝ',
-    'Kau': 'ඛෞ', 'Ka/n': 'ඛං', 'Ka/h': 'ඛඃ', 'Kra': 'ඛ්‍ර', 'Kraa': 'ඛ්‍රා', 'KrA': 'ඛ්‍රැ', 'KrAa': 'ඛ්‍රෑ', 'Kri': 'ඛ්‍රි', 'Krii': 'ක්‍රී', 'Kru': 'ඛෘ', 'Kruu': 'ඛෲ', 'Kre': 'ඛ්‍රෙ', 'Krea': 'ඛ්‍රේ', 'Kro': 'ඛ්‍රො', 'Kroe': 'ඛ්‍රෝ',
+    'Kau': 'ඛෞ', 'Ka/n': 'ඛං', 'Ka/h': 'ඛඃ', 'Kra': 'ඛ්‍ර', 'Kraa': 'ඛ්‍රා', 'KrA': 'ඛ්‍රැ', 'KrAa': 'ඛ්‍රෑ', 'Kri': 'ඛ්‍රි', 'Krii': 'ඛ්‍රී', 'Kru': 'ඛෘ', 'Kruu': 'ඛෲ', 'Kre': 'ඛ්‍රෙ', 'Krea': 'ඛ්‍රේ', 'Kro': 'ඛ්‍රො', 'Kroe': 'ඛ්‍රෝ',
     #g
     'g': 'ග්', 'ga': 'ග', 'gaa': 'ගා', 'gA': 'ගැ', 'gAa': 'ගෑ', 'gi': 'ගි', 'gii': 'ගී', 'gu': 'ගු', 'guu': 'ගූ', 'g/R': 'ගෘ', 'g/Rr': 'ගෲ', 'ge': 'ගෙ', 'gea': 'ගේ', 'gI': 'ගෛ', 'go': 'ගො', 'goe': 'ගෝ',
     'gau': 'ගෞ', 'ga/n': 'ගං', 'ga/h': 'ගඃ', 'gra': 'ග්‍ර', 'graa': 'ග්‍රා', 'grA': 'ග්‍රැ', 'grAa': 'ග්‍රෑ', 'gri': 'ග්‍රි', 'grii': 'ග්‍රී', 'gru': 'ගෘ', 'gruu': 'ගෲ', 'gre': 'ග්‍රෙ', 'grea': 'ග්‍රේ', 'gro': 'ග්‍රො', 'groe': 'ග්‍රෝ',
@@ -74,7 +90,7 @@ TRANSLITERATION_MAP: Dict[str, str] = {
     #l
     'l': 'ල්', 'la': 'ල', 'laa': 'ලා', 'lA': 'ලැ', 'lAa': 'ලෑ', 'li': 'ලි', 'lii': 'ලී', 'lu': 'ලු', 'luu': 'ලූ', 'l/R': 'ලෘ', 'l/Rr': 'ලෲ', 'le': 'ලෙ', 'lea': 'ලේ', 'lI': 'ලෛ', 'lo': 'ලො', 'loe': 'ලෝ', 
     'lau': 'ලෞ', 'la/n': 'ලං', 'la/h': 'ලඃ', 'lra': 'ල්‍ර', 'lraa': 'ල්‍රා', 'lrA': 'ල්‍රැ', 'lrAa': 'ල්‍රෑ', 'lri': 'ල්‍රි', 'lrii': 'ල්‍රී', 'lru': 'ලෘ', 'lruu': 'ලෲ', 'lre': 'ල්‍රෙ', 'lrea': 'ල්‍රේ', 'lro': 'ල්‍රො', 'lroe': 'ල්‍රෝ',
-    'L': 'ළ්', 'La': 'ළ', 'Laa': 'ළා', 'LA': 'ළැ', 'LAa': 'ළෑ', 'Li': 'ළි', 'Lii': 'ළී', 'Lu': 'ළු', 'Luu': 'ළුු', 'L/R': 'ළෘ', 'L/Rr': 'ළෲ', 'Le': 'ළෙ', 'Lea': 'ළේ', 'LI': 'ළෛ', 'Lo': 'ළො', 'Loe': 'ළෝ',
+    'L': 'ළ්', 'La': 'ළ', 'Laa': 'ළා', 'LA': 'ළැ', 'LAa': 'ළෑ', 'Li': 'ළි', 'Lii': 'ළී', 'Lu': 'ළු', 'Luu': 'ළූ', 'L/R': 'ළෘ', 'L/Rr': 'ළෲ', 'Le': 'ළෙ', 'Lea': 'ළේ', 'LI': 'ළෛ', 'Lo': 'ළො', 'Loe': 'ළෝ',
     'Lau': 'ළෞ', 'La/n': 'ළං', 'La/h': 'ළඃ', 'Lra': 'ළ්‍ර', 'Lraa': 'ළ්‍රා', 'LrA': 'ළ්‍රැ', 'LrAa': 'ළ්‍රෑ', 'Lri': 'ළ්‍රි', 'Lrii': 'ළ්‍රී', 'Lru': 'ළෘ', 'Lruu': 'ළෲ', 'Lre': 'ළ්‍රෙ', 'Lrea': 'ළ්‍රේ', 'Lro': 'ළ්‍රො', 'Lroe': 'ළ්‍රෝ',
     #v
     'v': 'ව්', 'va': 'ව', 'vaa': 'වා', 'vA': 'වැ', 'vAa': 'වෑ', 'vi': 'වි', 'vii': 'වී', 'vu': 'වු', 'vuu': 'වූ', 'v/R': 'වෘ', 'v/Rr': 'වෲ', 've': 'වෙ', 'vea': 'වේ', 'vI': 'වෛ', 'vo': 'වො', 'voe': 'වෝ',
@@ -114,22 +130,22 @@ TRANSLITERATION_MAP: Dict[str, str] = {
     'Thae': 'ථැ', 'Thaea': 'ථෑ', 'dhie': 'දී', 'dhae': 'දැ', 'dhaea': 'දෑ', 'Dhie': 'ධී', 'Dhae': 'ධැ', 'Dhaea': 'ධෑ', 'pie': 'පී', 'pae': 'පැ', 'paea': 'පෑ', 'Pie': 'ඵී', 'Pae': 'ඵැ', 'Paea': 'ඵෑ', 'bie': 'බී', 'bae': 'බැ',
     'baea': 'බෑ', 'Bie': 'ඹී', 'Bae': 'ඹැ', 'Baea': 'ඹෑ', 'mie': 'මී', 'mae': 'මැ', 'maea': 'මෑ', 'yie': 'යී', 'yae': 'යැ', 'yaea': 'යෑ', 'rie': 'රී', 'rae': 'රැ', 'raea': 'රෑ', 'lie': 'ලී', 'lae': 'ලැ', 'laea': 'ලෑ',
     'Lie': 'ළී', 'Lae': 'ළැ', 'Laea': 'ළෑ', 'vie': 'වී', 'vae': 'වැ', 'vaea': 'වෑ', 'shie': 'ශී', 'shae': 'ශැ', 'shaea': 'ශෑ', 'Shie': 'ෂී', 'Shae': 'ෂැ', 'Shaea': 'ෂෑ', 'sie': 'සී', 'sae': 'සැ', 'saea': 'සෑ', 'hie': 'හී',
-    'hae': 'හැ', 'haea': 'හෑ', 'fie': 'ෆී', 'fae': 'ෆැ', 'faea': 'ෆෑ', 'Bie': 'ඹී', 'Bae': 'ඹැ', 'Baea': 'ඹෑ', 'nngie': 'ඟී', 'nngae': 'ඟැ', 'nngaea': 'ඟෑ', 'GNie': 'ඥී', 'GNae': 'ඥැ', 'GNaea': 'ඥෑ', 'KNie': 'ඤී', 'KNae': 'ඤැ',
+    'hae': 'හැ', 'haea': 'හෑ', 'fie': 'ෆී', 'fae': 'ෆැ', 'faea': 'ෆෑ', 'nngie': 'ඟී', 'nngae': 'ඟැ', 'nngaea': 'ඟෑ', 'GNie': 'ඥී', 'GNae': 'ඥැ', 'GNaea': 'ඥෑ', 'KNie': 'ඤී', 'KNae': 'ඤැ',
     'KNaea': 'ඤෑ', 'nndie': 'ඬී', 'nndae': 'ඬැ', 'nndaea': 'ඬෑ', 'nndhie': 'ඳී', 'nndhae': 'ඳැ', 'nndhaea': 'ඳෑ', 'bhie': 'භී', 'bhae': 'භැ', 'bhaea': 'භෑ',
 
     #Y
     'kY': 'ක්‍ය්','KY': 'ඛ්‍ය්','gY': 'ග්‍ය්','GY': 'ඝ්‍ය්','chY': 'ච්‍ය්','ChY': 'ඡ්‍ය්','jY': 'ජ්‍ය්','qY': 'ඣ්‍ය්','tY': 'ට්‍ය්','TY': 'ඨ්‍ය්','dY': 'ඩ්‍ය්','DY': 'ඪ්‍ය්','nY': 'න්‍ය්','NY': 'ණ්‍ය්','thY': 'ත්‍ය්','ThY': 'ථ්‍ය්','dhY': 'ද්‍ය්','DhY': 'ධ්‍ය්','pY': 'ප්‍ය්','PY': 'ඵ්‍ය්',
-    'bY': 'බ්‍ය්','BY': 'ඹ්‍ය්','mY': 'ම්‍ය්','yY': 'ය්‍ය්','rY': 'ර්‍ය්','lY': 'ල්‍ය්','LY': 'ළ්‍ය්','vY': 'ව්‍ය්','shY': 'ශ්‍ය්','ShY': 'ෂ්‍ය්','sY': 'ස්‍ය්','hY': 'හ්‍ය්','fY': 'ෆ්‍ය්','BY': 'ඹ්‍ය්','nngY': 'ඟ්‍ය්','GNY': 'ඥ්‍ය්','KNY': 'ඤ්‍ය්','nndY': 'ඬ්‍ය්','nndhY': 'ඬ්හ්‍ය්','bhY': 'භ්‍ය්',
+    'bY': 'බ්‍ය්','BY': 'ඹ්‍ය්','mY': 'ම්‍ය්','yY': 'ය්‍ය්','rY': 'ර්‍ය්','lY': 'ල්‍ය්','LY': 'ළ්‍ය්','vY': 'ව්‍ය්','shY': 'ශ්‍ය්','ShY': 'ෂ්‍ය්','sY': 'ස්‍ය්','hY': 'හ්‍ය්','fY': 'ෆ්‍ය්','nngY': 'ඟ්‍ය්','GNY': 'ඥ්‍ය්','KNY': 'ඤ්‍ය්','nndY': 'ඬ්‍ය්','nndhY': 'ඬ්හ්‍ය්','bhY': 'භ්‍ය්',
 
     #Ya
     'kYa': 'ක්‍ය', 'KYa': 'ඛ්‍ය', 'gYa': 'ග්‍ය', 'GYa': 'ඝ්‍ය', 'chYa': 'ච්‍ය', 'ChYa': 'ඡ්‍ය', 'jYa': 'ජ්‍ය', 'qYa': 'ඣ්‍ය', 'tYa': 'ට්‍ය', 'TYa': 'ඨ්‍ය', 'dYa': 'ඩ්‍ය', 'DYa': 'ඪ්‍ය', 'nYa': 'න්‍ය', 'NYa': 'ණ්‍ය', 'thYa': 'ත්‍ය', 'ThYa': 'ථ්‍ය', 
     'dhYa': 'ද්‍ය', 'DhYa': 'ධ්‍ය', 'pYa': 'ප්‍ය', 'PYa': 'ඵ්‍ය', 'bYa': 'බ්‍ය', 'BYa': 'ඹ්‍ය', 'mYa': 'ම්‍ය', 'yYa': 'ය්‍ය', 'rYa': 'ර්‍ය', 'lYa': 'ල්‍ය', 'LYa': 'ළ්‍ය', 'vYa': 'ව්‍ය', 'shYa': 'ශ්‍ය', 'ShYa': 'ෂ්‍ය', 'sYa': 'ස්‍ය', 'hYa': 'හ්‍ය', 
-    'fYa': 'ෆ්‍ය', 'BYa': 'ඹ්‍ය', 'nngYa': 'ඟ්‍ය', 'GNYa': 'ඥ්‍ය', 'KNYa': 'ඤ්‍ය', 'nndYa': 'ඬ්‍ය', 'nndhYa': 'ඬ්හ්‍ය', 'bhYa': 'භ්‍ය', 'R': 'ර්‍', '/r': 'ර්‍',
+    'fYa': 'ෆ්‍ය', 'nngYa': 'ඟ්‍ය', 'GNYa': 'ඥ්‍ය', 'KNYa': 'ඤ්‍ය', 'nndYa': 'ඬ්‍ය', 'nndhYa': 'ඬ්හ්‍ය', 'bhYa': 'භ්‍ය', 'R': 'ර්‍', '/r': 'ර්‍',
 
     #Yaa
     'kYaa': 'ක්‍යා', 'KYaa': 'ඛ්‍යා', 'gYaa': 'ග්‍යා', 'GYaa': 'ඝ්‍යා', 'chYaa': 'ච්‍යා', 'ChYaa': 'ඡ්‍යා', 'jYaa': 'ජ්‍යා', 'qYaa': 'ඣ්‍යා', 'tYaa': 'ට්‍යා', 'TYaa': 'ඨ්‍යා', 'dYaa': 'ඩ්‍යා', 'DYaa': 'ඪ්‍යා', 'nYaa': 'න්‍යා', 'NYaa': 'ණ්‍යා', 'thYaa': 'ත්‍යා',
     'ThYaa': 'ථ්‍යා', 'dhYaa': 'ද්‍යා', 'DhYaa': 'ධ්‍යා', 'pYaa': 'ප්‍යා', 'PYaa': 'ඵ්‍යා', 'bYaa': 'බ්‍යා', 'BYaa': 'ඹ්‍යා', 'mYaa': 'ම්‍යා', 'yYaa': 'ය්‍යා', 'rYaa': 'ර්‍යා', 'lYaa': 'ල්‍යා', 'LYaa': 'ළ්‍යා', 'vYaa': 'ව්‍යා', 'shYaa': 'ශ්‍යා', 'ShYaa': 'ෂ්‍යා',
-    'sYaa': 'ස්‍යා', 'hYaa': 'හ්‍යා', 'fYaa': 'ෆ්‍යා', 'BYaa': 'ඹ්‍යා', 'nngYaa': 'ඟ්‍යා', 'GNYaa': 'ඥ්‍යා', 'KNYaa': 'ඤ්‍යා', 'nndYaa': 'ඬ්‍යා', 'nndhYaa': 'ඬ්හ්‍යා', 'bhYaa': 'භ්‍යා',
+    'sYaa': 'ස්‍යා', 'hYaa': 'හ්‍යා', 'fYaa': 'ෆ්‍යා', 'nngYaa': 'ඟ්‍යා', 'GNYaa': 'ඥ්‍යා', 'KNYaa': 'ඤ්‍යා', 'nndYaa': 'ඬ්‍යා', 'nndhYaa': 'ඬ්හ්‍යා', 'bhYaa': 'භ්‍යා',
 
     #w
     'w': 'ව්', 'wa': 'ව', 'waa': 'වා', 'wA': 'වැ', 'wAa': 'වෑ', 'wi': 'වි', 'wii': 'වී', 'wu': 'වු', 'wuu': 'වූ', 'w/R': 'වෘ', 'w/Rr': 'වෲ', 'we': 'වෙ', 'wea': 'වේ', 'wI': 'වෛ', 'wo': 'වො', 'woe': 'වෝ',
@@ -141,41 +157,1103 @@ TRANSLITERATION_MAP: Dict[str, str] = {
 
 }
 
-def transliterate(text: str) -> str:
+# Longest key in the map; greedy matching never needs to look further ahead than this
+MAX_KEY_LENGTH = max(map(len, TRANSLITERATION_MAP))
+
+# Number of characters read at a time when transliterating files
+CHUNK_SIZE = 1 << 20
+
+# Bytes scanned at a time in a memory-mapped file. Nothing is copied to carry matches
+# over a window's end, so small windows that stay in the CPU cache are the fastest.
+MAPPED_CHUNK_SIZE = 16 << 10
+
+# Bytes of a memory-mapped file transliterated between releases of its pages
+_RELEASE_SIZE = 4 << 20
+
+# The bytes that are not UTF-8 continuation bytes, deleted to count characters
+_LEADING_BYTES = bytes(range(0x80)) + bytes(range(0xC0, 0x100))
+
+# Texts joined into one scan by Matcher.transliterate_many()
+BATCH_TEXTS = 4096
+
+# Separator placed between the texts of a batch; it must start no key
+_BATCH_SEPARATOR = "\0"
+
+# Texts per task sent to a worker process by transliterate_many()
+MANY_CHUNK_SIZE = 100000
+
+# Default number of distinct words kept by a TokenCache
+TOKEN_CACHE_SIZE = 4096
+
+# Precompiled matcher written by `python -m singlish build-table`. PyInstaller builds
+# ship it next to the executable's other data files.
+TABLE_FILE = "singlish.table"
+TABLE_PATH = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), TABLE_FILE)
+TABLE_MAGIC = b"SGLT"
+TABLE_VERSION = 3
+# magic, format version, regex engine magic, code word size, Python major and minor,
+# mapping digest, regex flags, group count, regex source length, mapping length, code length
+_TABLE_HEADER = struct.Struct("<4sHIBBB32sIIIII")
+
+# Text copied through unchanged by transliterate(..., protect=True): `backtick quoted`
+# spans and URLs. Each alternative starts with a literal, so as extra alternatives of
+# the matcher regex they leave the regex engine's skip-ahead intact.
+_PROTECTED_ALTERNATIVES = (r"`[^`\n]*`", r"https?://[^\s<>\"'`]+", r"ftp://[^\s<>\"'`]+", r"www\.[^\s<>\"'`]+")
+# One capturing group, so split() puts the spans at odd indexes
+PROTECTED_SPANS = re.compile("(" + "|".join(_PROTECTED_ALTERNATIVES) + ")")
+
+# Order in which trie branches are tried. Lowercase vowels and common consonants come
+# first so the regex engine usually hits the right branch on its first or second probe.
+_BRANCH_ORDER = "aeiounmkgdtrlyswhbpjcvfzqxAEIOUNMKGDTRLYSWHBPJCVFZQX/"
+
+
+def build_trie(mapping: Dict[str, str]) -> dict:
+    """Build a prefix trie of the mapping's keys. A node holding "" ends a key."""
+    root: dict = {}
+    for key in mapping:
+        node = root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = True
+    return root
+
+
+def _branch_key(char: str, order: str = _BRANCH_ORDER):
+    position = order.find(char)
+    return (position if position >= 0 else len(order), char)
+
+
+def _trie_to_regex(node: dict, order: str = _BRANCH_ORDER, first: Tuple[str, ...] = (),
+                   guards: Optional[Dict[str, str]] = None, root: bool = True) -> str:
+    """
+    Flatten a trie node into a regex that matches the longest key below it.
+    Longer continuations are listed before the empty alternative, so the first
+    successful branch is always the greedy longest match. `first` holds extra
+    alternatives tried before all others. `guards` maps characters to a regex put
+    before every edge with that character below the root, such as a lookahead.
+    """
+    guard = guards if guards and not root else {}
+    branches = list(first) + [guard.get(char, "") + re.escape(char) + _trie_to_regex(node[char], order, (), guards, False)
+                for char in sorted((c for c in node if c), key=lambda c: _branch_key(c, order))]
+    if "" in node:
+        if not branches:
+            return ""
+        branches.append("")
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+def escape_chars(mapping: Dict[str, str]) -> str:
+    """
+    Characters X whose escape //X is a key standing for X itself and the start of no
+    longer key. Greedy matching cuts a run of such escapes into single escapes no
+    matter what follows, so the whole run can be matched and written out at once.
+    """
+    escapes = {key[2] for key, value in mapping.items() if len(key) == 3 and key[:2] == "//" and value == key[2]}
+    longer = {key[2] for key in mapping if len(key) > 3 and key[:2] == "//"}
+    return "".join(sorted(escapes - longer))
+
+
+def matcher_regex(mapping: Dict[str, str], order: str = _BRANCH_ORDER, protect: bool = False) -> str:
+    """
+    Source of the matcher regex for a mapping: its whole trie in one capturing group,
+    preceded by an alternative that takes a run of two or more escapes as one token.
+    With protect=True the PROTECTED_SPANS come before that, each as a token of its own.
+    """
+    escapes = escape_chars(mapping)
+    first, guards = (), None
+    if protect:
+        # A key must not run into a span: the text before a span is transliterated as
+        # if the span were not there, so no edge inside a key may start one
+        first = _PROTECTED_ALTERNATIVES
+        lookahead = "(?!" + "|".join(_PROTECTED_ALTERNATIVES) + ")"
+        guards = {alternative[0]: lookahead for alternative in _PROTECTED_ALTERNATIVES}
+        escapes = "".join(char for char in escapes if char not in guards)
+    if escapes:
+        escape = "//[" + "".join(map(re.escape, escapes)) + "]"
+        # Kept in the trie's own alternation and spelt with a literal start, so the
+        # regex engine can still skip straight to the characters that start a key
+        first += (escape + "(?:" + escape + ")+",)
+    return "(" + _trie_to_regex(build_trie(mapping), order, first, guards) + ")"
+
+
+def _mapping_digest(mapping: Dict[str, str]) -> bytes:
+    import hashlib  # Only needed once the table is loaded, keep it off the import path
+    return hashlib.sha256(repr(mapping).encode("utf-8")).digest()
+
+
+def _compile_program(source: str):
+    """
+    Compile a regex into the regex engine's program, as (engine magic, code word size,
+    flags, group count, code). None if this Python lacks the private modules for it.
+    """
+    try:
+        try:
+            from re import _compiler as sre_compile, _parser as sre_parse  # Python 3.11+
+        except ImportError:
+            import sre_compile, sre_parse
+        parsed = sre_parse.parse(source, 0)
+        return (_sre.MAGIC, _sre.CODESIZE, parsed.state.flags, parsed.state.groups,
+                sre_compile._code(parsed, 0))
+    except (ImportError, AttributeError):
+        return None
+
+
+def build_table(path: str, mapping: Dict[str, str] = TRANSLITERATION_MAP):
+    """
+    Write the compiled matcher for a mapping to a table file.
+    The file holds the regex engine's compiled program, so loading it skips parsing
+    and compiling the regex. The program is only valid for the Python version that
+    wrote it, but the mapping is stored too, so any version can still use the file.
+    A Python without the engine's private modules writes the mapping alone.
+    """
+    import json
+
+    source = matcher_regex(mapping)
+    sre_magic, code_size, flags, groups, program = _compile_program(source) or (0, 0, 0, 0, [])
+    code = array("I", program)
+    if sys.byteorder != "little":
+        code.byteswap()
+    encoded = source.encode("utf-8")
+    encoded_mapping = json.dumps(mapping, ensure_ascii=False).encode("utf-8")
+    header = _TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, sre_magic, code_size,
+                                sys.version_info[0], sys.version_info[1], _mapping_digest(mapping),
+                                flags, groups, len(encoded), len(encoded_mapping), len(code))
+    # Pad the regex source and mapping so the code array starts 4-byte aligned
+    padding = -(len(header) + len(encoded) + len(encoded_mapping)) % 4
+    with open(path, "wb") as file:
+        file.write(header + encoded + encoded_mapping + b"\0" * padding + code.tobytes())
+
+
+def load_table(path: str, mapping: Dict[str, str] = TRANSLITERATION_MAP) -> Optional["re.Pattern[str]"]:
+    """
+    Load the matcher regex from a table file written by build_table().
+    Returns None if the file is missing, damaged, written by another Python version,
+    built from a different mapping or holds no program, or if this Python lacks the
+    regex engine's internals, in which case the caller compiles it instead.
+    """
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            (magic, version, sre_magic, code_size, major, minor, digest,
+             flags, groups, source_length, mapping_length, code_length) = _TABLE_HEADER.unpack_from(view)
+            if (magic != TABLE_MAGIC or version != TABLE_VERSION or sre_magic != _sre.MAGIC
+                    or code_size != _sre.CODESIZE or (major, minor) != sys.version_info[:2]
+                    or digest != _mapping_digest(mapping) or not code_length):
+                return None
+            start = _TABLE_HEADER.size
+            source = view[start:start + source_length].decode("utf-8")
+            start += source_length + mapping_length
+            start += -start % 4
+            code = array("I", view[start:start + 4 * code_length])
+    except (OSError, ValueError, struct.error, AttributeError):
+        return None
+    if sys.byteorder != "little":
+        code.byteswap()
+    try:
+        return _sre.compile(source, flags, code.tolist(), groups - 1, {}, (None,) * groups)
+    except (TypeError, RuntimeError, AttributeError):
+        return None
+
+
+def read_table_mapping(path: str) -> Dict[str, str]:
+    """
+    Read the mapping stored in a table file, whichever Python version wrote it.
+    Raises ValueError if the file is not a table.
+    """
+    import json
+    with open(path, "rb") as file:
+        data = file.read()
+    try:
+        magic, version, *_, digest, _, _, source_length, mapping_length, _ = _TABLE_HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError(f"{path} is not a transliteration table") from None
+    # Version 2 tables store the mapping the same way, only their regex is older
+    if magic != TABLE_MAGIC or version not in (2, TABLE_VERSION):
+        raise ValueError(f"{path} is not a version 2 or {TABLE_VERSION} transliteration table")
+    start = _TABLE_HEADER.size + source_length
+    mapping = json.loads(data[start:start + mapping_length].decode("utf-8"))
+    if _mapping_digest(mapping) != digest:
+        raise ValueError(f"{path} is damaged: its mapping does not match its digest")
+    return mapping
+
+
+def _final_parts(parts: list, length: int, limit: int) -> int:
+    """
+    Drop the trailing segments of split() output for text of `length` characters that
+    start at or after `limit` and could still change with more input. Returns the
+    offset where the kept segments end.
+    """
+    # Walk back from the end to the first segment boundary at or after limit
+    index = len(parts)
+    cut = length
+    while index:
+        start = cut - len(parts[index - 1])
+        if start < limit:
+            if index % 2:
+                # A run of unmatched characters has a boundary at every character
+                parts[index - 1] = parts[index - 1][:limit - start]
+                cut = limit
+            break
+        cut = start
+        index -= 1
+    del parts[index:]
+    return cut
+
+
+class _Tokens(dict):
+    """
+    The mapping as the matcher regex's tokens see it: a token that is no key is a run
+    of escapes, and every escape //X stands for its character X.
+    """
+
+    def __missing__(self, run: str) -> str:
+        return run[2::3]
+
+
+class _ProtectedTokens(_Tokens):
+    """The tokens of the protected matcher regex, where any other token is a protected span."""
+
+    def __missing__(self, token: str) -> str:
+        return super().__missing__(token) if token.startswith("//") else token
+
+
+class Matcher:
+    """
+    Greedy longest-match transliterator compiled from a key -> value mapping.
+    The mapping's trie is compiled once into a single regex, so the whole scan
+    runs inside the regex engine instead of probing every key length per character.
+    """
+
+    def __init__(self, mapping: Dict[str, str], pattern: Optional["re.Pattern[str]"] = None):
+        self.mapping = mapping
+        self.tokens = _Tokens(mapping)
+        self.max_key_length = max(map(len, mapping), default=0)
+        # One capturing group: split() then alternates unmatched text and keys
+        self.pattern = pattern or re.compile(matcher_regex(mapping))
+        self._words: Optional["re.Pattern[str]"] = None
+        self._byte_pattern: Optional["re.Pattern[bytes]"] = None
+        self._byte_tokens: Optional[_Tokens] = None
+        self._protected_pattern: Optional["re.Pattern[str]"] = None
+        self._protected_tokens: Optional[_Tokens] = None
+
+    def transliterate(self, text: str) -> str:
+        if not text:
+            return ""
+        parts = self.pattern.split(text)
+        # Odd indexes hold the matched keys, even indexes the text copied through
+        parts[1::2] = map(self.tokens.__getitem__, parts[1::2])
+        return "".join(parts)
+
+    def transliterate_protected(self, text: str) -> str:
+        """
+        Transliterate text, copying the PROTECTED_SPANS in it through unchanged. The
+        spans are alternatives of the matcher regex, so this is still a single scan.
+        """
+        if self._protected_pattern is None:
+            self._protected_pattern = re.compile(matcher_regex(self.mapping, protect=True))
+            self._protected_tokens = _ProtectedTokens(self.mapping)
+        parts = self._protected_pattern.split(text)
+        parts[1::2] = map(self._protected_tokens.__getitem__, parts[1::2])
+        return "".join(parts)
+
+    @property
+    def words(self) -> "re.Pattern[str]":
+        """
+        Regex whose split() separates runs of characters that occur in the keys from
+        the text in between. No key spans a character outside the runs, so every run
+        can be transliterated on its own.
+        """
+        if self._words is None:
+            alphabet = sorted(set("".join(self.mapping)))
+            self._words = re.compile("([" + "".join(map(re.escape, alphabet)) + "]+)")
+        return self._words
+
+    def _transliterate_words(self, texts: List[str]) -> List[str]:
+        """
+        Transliterate a list of strings BATCH_TEXTS at a time. A batch is joined with a
+        separator that occurs in no key and split into words; only words not seen
+        before are transliterated, all together in one scan, and the rest are looked up.
+        """
+        separator = _BATCH_SEPARATOR
+        if self.words.match(separator):
+            return list(map(self.transliterate, texts))
+        known: Dict[str, str] = {}
+        results: List[str] = []
+        for start in range(0, len(texts), BATCH_TEXTS):
+            batch = texts[start:start + BATCH_TEXTS]
+            parts = self.words.split(separator.join(batch))
+            # Odd indexes hold the words, even indexes the text between them
+            words = parts[1::2]
+            new = list(set(words).difference(known))
+            if new:
+                output = self.transliterate(separator.join(new)).split(separator)
+                # A value holding the separator breaks the split
+                known.update(zip(new, output if len(output) == len(new) else map(self.transliterate, new)))
+            parts[1::2] = map(known.__getitem__, words)
+            output = "".join(parts).split(separator)
+            results += output if len(output) == len(batch) else map(self.transliterate, batch)
+        return results
+
+    def transliterate_many(self, texts: Iterable[str]) -> List[str]:
+        """
+        Transliterate many texts, returning the results in order, much faster than one
+        call per text. Items that are not strings (None, NaN) are returned as they are.
+        When most texts are repeats each distinct one is transliterated once; either
+        way columns of names or titles share a small vocabulary, so most of their
+        words are looked up instead of scanned.
+        """
+        if not isinstance(texts, (list, tuple)):
+            texts = list(texts)
+        unique = set(texts)
+        if 2 * len(unique) <= len(texts):
+            strings = [text for text in unique if isinstance(text, str)]
+            lookup = dict(zip(strings, self._transliterate_words(strings)))
+            # get(text, text) hands back anything that is not a string unchanged
+            return list(map(lookup.get, texts, texts))
+        strings = [text for text in texts if isinstance(text, str)]
+        if len(strings) == len(texts):
+            return self._transliterate_words(strings)
+        results = iter(self._transliterate_words(strings))
+        return [next(results) if isinstance(text, str) else text for text in texts]
+
+    def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Transliterate text arriving in chunks, yielding output as it becomes final.
+        Only the last max_key_length - 1 characters of each chunk can still change
+        with more input, so at most that much is carried over to the next chunk.
+        """
+        return self._stream(chunks, self.pattern, self.tokens, "")
+
+    def stream_bytes(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """stream() for UTF-8 bytes in and out, see transliterate_bytes()."""
+        pattern = self.byte_pattern
+        # A memoryview cannot be concatenated with the carry; bytes chunks are used as they are
+        return self._stream(map(bytes, chunks), pattern, self._byte_tokens, b"")
+
+    def _stream(self, chunks, pattern, tokens, empty):
+        carry = empty
+        lookahead = self.max_key_length - 1
+        for chunk in chunks:
+            buffer = carry + chunk if carry else chunk
+            # Segments starting before limit see their whole lookahead window
+            limit = len(buffer) - lookahead
+            if limit <= 0:
+                carry = buffer
+                continue
+            parts = pattern.split(buffer)
+            cut = _final_parts(parts, len(buffer), limit)
+            parts[1::2] = map(tokens.__getitem__, parts[1::2])
+            carry = buffer[cut:]
+            yield empty.join(parts)
+        if carry:
+            parts = pattern.split(carry)
+            parts[1::2] = map(tokens.__getitem__, parts[1::2])
+            yield empty.join(parts)
+
+    @property
+    def byte_pattern(self) -> "re.Pattern[bytes]":
+        """
+        The matcher regex compiled for bytes. Only ASCII keys can be matched in bytes;
+        UTF-8 never uses ASCII bytes inside a multi-byte character, so in UTF-8 text
+        the bytes regex finds exactly the keys the str regex finds.
+        """
+        if self._byte_pattern is None:
+            source = self.pattern.pattern
+            if not source.isascii():
+                raise ValueError("only a scheme whose keys are all ASCII can transliterate bytes")
+            self._byte_pattern = re.compile(source.encode("ascii"), self.pattern.flags & ~re.UNICODE)
+            # Values are encoded once here instead of once per match
+            self._byte_tokens = _Tokens({key.encode("ascii"): value.encode("utf-8")
+                                         for key, value in self.mapping.items()})
+        return self._byte_pattern
+
+    def transliterate_bytes(self, data) -> bytes:
+        """
+        Transliterate UTF-8 bytes to UTF-8 bytes without decoding them. data may be any
+        buffer: bytes, bytearray, mmap or a memoryview, which is scanned where it lies.
+        Bytes that start no key, including every non-ASCII byte, are copied through.
+        """
+        if isinstance(data, memoryview):
+            data = data.cast("B")
+        if len(data) <= MAPPED_CHUNK_SIZE:
+            parts = self.byte_pattern.split(data)
+            parts[1::2] = map(self._byte_tokens.__getitem__, parts[1::2])
+            return b"".join(parts)
+        pieces: List[bytes] = []
+        self.transliterate_mapped(data, pieces.append)
+        return b"".join(pieces)
+
+    def transliterate_mapped(self, view, write: Callable[[bytes], object],
+                             chunk_size: int = MAPPED_CHUNK_SIZE) -> int:
+        """
+        Transliterate UTF-8 bytes held in a buffer such as an mmap, chunk_size bytes at
+        a time, passing the UTF-8 output to write(). Bytes that start no key, including
+        every non-ASCII byte, are copied through. Returns the number of characters read.
+        Only the window being scanned is ever copied out of the buffer.
+        """
+        pattern = self.byte_pattern
+        tokens = self._byte_tokens
+        lookahead = self.max_key_length - 1
+        # A window must reach past the lookahead, or no segment in it would be final
+        chunk_size = max(chunk_size, 2 * self.max_key_length)
+        size = len(view)
+        pos = 0
+        chars = 0
+        released = 0
+        release = getattr(view, "madvise", None) if isinstance(view, mmap.mmap) else None
+        if release is not None:
+            release(mmap.MADV_SEQUENTIAL)
+        while pos < size:
+            # Slicing bytes or an mmap already gives bytes, which bytes() hands back as it is
+            window = bytes(view[pos:pos + chunk_size])
+            parts = pattern.split(window)
+            if pos + len(window) < size:
+                # The file itself holds what follows, so nothing is carried over:
+                # the next window simply starts at the cut
+                cut = _final_parts(parts, len(window), len(window) - lookahead)
+                window = window[:cut]
+            else:
+                cut = len(window)
+            parts[1::2] = map(tokens.__getitem__, parts[1::2])
+            write(b"".join(parts))
+            if release is not None and pos + cut - released >= _RELEASE_SIZE:
+                # Drop the pages read for the last time from the resident set, so it
+                # stays flat however large a mapped file is
+                end = (pos + cut) - (pos + cut) % mmap.ALLOCATIONGRANULARITY
+                release(mmap.MADV_DONTNEED, released, end - released)
+                released = end
+            # Every UTF-8 character has exactly one byte that is not a continuation byte
+            chars += cut if window.isascii() else cut - len(window.translate(None, _LEADING_BYTES))
+            pos += cut
+        return chars
+
+
+_matcher: Optional[Matcher] = None
+
+# Matchers of the scheme files loaded so far, by path
+_schemes: Dict[str, Matcher] = {}
+
+
+def load_scheme(path: str) -> Matcher:
+    """
+    Build the matcher for a scheme file: a table written by build_table(), or a
+    spreadsheet, CSV, JSON or Python table read by the scheme compiler.
+    """
+    if path.endswith(".table"):
+        mapping = read_table_mapping(path)
+        return Matcher(mapping, load_table(path, mapping))
+    import singlish_scheme
+    return Matcher(singlish_scheme.compile_scheme(path))
+
+
+def get_matcher(scheme: Union[None, str, "os.PathLike[str]", Matcher] = None) -> Matcher:
+    """
+    Return the matcher for a scheme. With no scheme that is TRANSLITERATION_MAP, loaded
+    from the table file on first use, or compiled from the map if the table is missing
+    or out of date. A Matcher is returned as it is, and a path is loaded with
+    load_scheme() once and kept, so switching between schemes costs a dict lookup.
+    """
+    global _matcher
+    if scheme is None:
+        if _matcher is None:
+            pattern = load_table(TABLE_PATH) if TABLE_PATH else None
+            _matcher = Matcher(TRANSLITERATION_MAP, pattern)
+        return _matcher
+    if isinstance(scheme, Matcher):
+        return scheme
+    path = os.fspath(scheme)
+    matcher = _schemes.get(path)
+    if matcher is None:
+        matcher = _schemes[path] = load_scheme(path)
+    return matcher
+
+
+def transliterate(text: str, scheme: Union[None, str, "os.PathLike[str]", Matcher] = None,
+                  protect: bool = False) -> str:
     """
     Transliterate English text to Sinhala.
-    Optimized version with better string handling.
+    At each position the longest key of the scheme, TRANSLITERATION_MAP unless another
+    one is given (see get_matcher()), is replaced by its Sinhala value; characters
+    that start no key are kept as they are. With protect=True, `backtick quoted`
+    spans and URLs are copied through without being transliterated.
     """
     if not text:
         return ""
-        
-    # Pre-allocate result list for better performance
-    result = []
-    i = 0
-    text_len = len(text)
-    
-    while i < text_len:
-        # Try to match longer combinations first
-        matched = False
-        for length in (8, 7, 6, 5, 4, 3, 2, 1):  # Check 8-letter to single letter combinations
-            if i + length <= text_len:
-                substr = text[i:i+length]
-                if substr in TRANSLITERATION_MAP:
-                    result.append(TRANSLITERATION_MAP[substr])
-                    i += length
-                    matched = True
+    if protect:
+        return get_matcher(scheme).transliterate_protected(text)
+    return get_matcher(scheme).transliterate(text)
+
+
+# Matcher of a transliterate_many() worker process, set up by _start_worker()
+_worker_matcher: Optional[Matcher] = None
+
+
+def _start_worker(scheme):
+    global _worker_matcher
+    _worker_matcher = get_matcher(scheme)
+
+
+def _transliterate_chunk(texts: List[str]) -> List[str]:
+    return _worker_matcher.transliterate_many(texts)
+
+
+def transliterate_many(texts, scheme: Union[None, str, "os.PathLike[str]", Matcher] = None,
+                       processes: int = 1, chunk_size: int = MANY_CHUNK_SIZE):
+    """
+    Transliterate a column of texts, such as names or titles, far faster than calling
+    transliterate() on each one (see Matcher.transliterate_many()).
+    A NumPy array or pandas Series is returned as the same type, shape and index
+    included; any other iterable gives a list. Items that are not strings, such as
+    missing values, are returned as they are. With processes > 1 the texts are
+    sent to a pool of worker processes in chunks of chunk_size.
+    """
+    # Neither library is a dependency: if the input is one of theirs it is already imported
+    numpy = sys.modules.get("numpy")
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and isinstance(texts, pandas.Series):
+        kind, items = "series", texts.tolist()
+    elif numpy is not None and isinstance(texts, numpy.ndarray):
+        kind, items = "array", texts.ravel().tolist()
+    else:
+        kind, items = "list", texts if isinstance(texts, (list, tuple)) else list(texts)
+
+    matcher = get_matcher(scheme)
+    if processes > 1 and len(items) > chunk_size:
+        # Send each distinct text to the workers only once if most of them are repeats
+        unique = set(items)
+        distinct = list(unique) if 2 * len(unique) <= len(items) else items
+        if len(distinct) > chunk_size:
+            from multiprocessing import Pool
+            chunks = [distinct[start:start + chunk_size] for start in range(0, len(distinct), chunk_size)]
+            # Each worker loads the scheme once; a Matcher is pickled and recompiled there
+            with Pool(processes, initializer=_start_worker, initargs=(scheme,)) as pool:
+                results = [text for chunk in pool.imap(_transliterate_chunk, chunks) for text in chunk]
+        else:
+            results = matcher.transliterate_many(distinct)
+        if distinct is not items:
+            lookup = dict(zip(distinct, results))
+            results = list(map(lookup.get, items, items))
+    else:
+        results = matcher.transliterate_many(items)
+
+    if kind == "series":
+        # Categories of the input do not fit the output, any other dtype is kept
+        dtype = None if isinstance(texts.dtype, pandas.CategoricalDtype) else texts.dtype
+        return pandas.Series(results, index=texts.index, name=texts.name, dtype=dtype)
+    if kind == "array":
+        # Sinhala output is usually longer than its input, so a fixed-width
+        # unicode dtype is not kept; numpy picks one wide enough
+        dtype = object if texts.dtype == object else str
+        return numpy.array(results, dtype=dtype).reshape(texts.shape)
+    return results
+
+
+# Every TokenCache still alive, whose hit and miss counts singlish_trace reports at exit
+_token_caches: "weakref.WeakSet[TokenCache]" = weakref.WeakSet()
+
+
+class TokenCache:
+    """
+    Word-level LRU cache in front of a matcher, for text that repeats the same words.
+    Input is split into runs of characters that occur in the mapping's keys. No key
+    can span the characters in between, so transliterating every run on its own gives
+    the same output as transliterating the whole text.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, matcher: Optional[Matcher] = None):
+        self.matcher = matcher or get_matcher()
+        self._words = self.matcher.words
+        self._lookup = lru_cache(maxsize=maxsize)(self.matcher.transliterate)
+        _token_caches.add(self)
+
+    def transliterate(self, text: str) -> str:
+        if not text:
+            return ""
+        parts = self._words.split(text)
+        # Odd indexes hold the words, even indexes the separators between them
+        parts[1::2] = map(self._lookup, parts[1::2])
+        return "".join(parts)
+
+    def cache_info(self):
+        """Hits, misses, maxsize and current size of the word cache."""
+        return self._lookup.cache_info()
+
+    @property
+    def hits(self) -> int:
+        return self._lookup.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._lookup.cache_info().misses
+
+    def clear(self):
+        """Empty the cache and reset the counters."""
+        self._lookup.cache_clear()
+
+
+def transliterate_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Transliterate an iterable of text chunks lazily.
+    Joining the yielded pieces gives the same result as transliterate() on the
+    joined input, whatever the chunk boundaries are.
+    """
+    return get_matcher().stream(chunks)
+
+
+def transliterate_bytes(data, scheme: Union[None, str, "os.PathLike[str]", Matcher] = None) -> bytes:
+    """
+    Transliterate UTF-8 encoded English text, returning UTF-8 encoded Sinhala. Every
+    key is ASCII, so the bytes are matched directly against values encoded once up
+    front; no str is made of the input or the output. data may be bytes, bytearray,
+    an mmap or a memoryview. Invalid UTF-8 is copied through instead of raising.
+    """
+    return get_matcher(scheme).transliterate_bytes(data)
+
+
+def transliterate_bytes_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    transliterate_stream() for UTF-8 bytes. The chunks may split a character anywhere;
+    joining the yielded pieces gives the same result as transliterate_bytes() on the
+    joined input.
+    """
+    return get_matcher().stream_bytes(chunks)
+
+
+def transliterate_file(src, dst, chunk_size: Optional[int] = None, encoding: str = "utf-8",
+                       mmap: bool = False) -> int:
+    """
+    Transliterate the file at src into dst, reading chunk_size characters (CHUNK_SIZE
+    by default) at a time so memory use does not depend on the file size. Returns the
+    number of characters read. With mmap=True a UTF-8 file is memory-mapped and
+    transliterated as bytes, chunk_size bytes (MAPPED_CHUNK_SIZE) at a time, which
+    skips decoding and encoding it; see _transliterate_mapped_file().
+    """
+    if mmap:
+        if codecs.lookup(encoding).name != "utf-8":
+            raise ValueError(f"mmap=True reads UTF-8 files only, not {encoding}")
+        return _transliterate_mapped_file(src, dst, chunk_size or MAPPED_CHUNK_SIZE)
+    chunk_size = chunk_size or CHUNK_SIZE
+    read = 0
+    with open(src, "r", encoding=encoding, newline="") as source, \
+            open(dst, "w", encoding=encoding, newline="") as target:
+        def chunks():
+            nonlocal read
+            for chunk in iter(lambda: source.read(chunk_size), ""):
+                read += len(chunk)
+                yield chunk
+        for piece in transliterate_stream(chunks()):
+            target.write(piece)
+    return read
+
+
+def _transliterate_mapped_file(src, dst, chunk_size: int = MAPPED_CHUNK_SIZE) -> int:
+    """
+    transliterate_file() for mmap=True. Bytes that are not ASCII are copied through
+    as they are, so unlike the str path this never fails on invalid UTF-8.
+    """
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        if not os.fstat(source.fileno()).st_size:
+            return 0  # An empty file cannot be mapped
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            return get_matcher().transliterate_mapped(view, target.write, chunk_size)
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of the common prefix of a and b. Windows of doubling size are compared
+    until one differs, and then that window is bisected, so the slices copied add up
+    to a few times the prefix rather than to the whole strings at every step.
+    """
+    limit = min(len(a), len(b))
+    low, size = 0, 64
+    while low < limit:
+        high = min(low + size, limit)
+        if a[low:high] != b[low:high]:
+            break
+        low, size = high, size * 2
+    else:
+        return low
+    # The first difference is in [low, high)
+    while high - low > 1:
+        mid = (low + high) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid
+    return low
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix of a and b, capped at limit characters."""
+    end_a, end_b = len(a), len(b)
+    low, size = 0, 64
+    while low < limit:
+        high = min(low + size, limit)
+        if a[end_a - high:end_a - low] != b[end_b - high:end_b - low]:
+            break
+        low, size = high, size * 2
+    else:
+        return low
+    while high - low > 1:
+        mid = (low + high) // 2
+        if a[end_a - mid:end_a - low] == b[end_b - mid:end_b - low]:
+            low = mid
+        else:
+            high = mid
+    return low
+
+
+def text_change(old: str, new: str) -> Tuple[int, int, str]:
+    """
+    Smallest single edit that turns old into new, as (start, removed, inserted):
+    replacing `removed` characters at `start` of old with `inserted` gives new.
+    """
+    if old == new:
+        return 0, 0, ""
+    prefix = _common_prefix_length(old, new)
+    suffix = _common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    return prefix, len(old) - suffix - prefix, new[prefix:len(new) - suffix]
+
+
+class IncrementalTransliterator:
+    """
+    Transliterates a document that is edited in place, such as a text box being typed into.
+    The match boundaries of the previous run are kept, so after an edit only the span
+    around it is transliterated again. Greedy matching looks at most MAX_KEY_LENGTH
+    characters ahead, which bounds how far an edit can move the boundaries around it.
+    """
+
+    # Segment boundaries are kept in blocks of about this many, each relative to the
+    # block's first one, so an edit shifts the blocks after it and not every boundary
+    BLOCK_SIZE = 128
+
+    def __init__(self, matcher: Optional[Matcher] = None):
+        self.matcher = matcher or get_matcher()
+        self.reset()
+
+    def reset(self):
+        """Forget the previous document."""
+        self.text = ""
+        self.output = ""
+        # Source and output offsets of every segment, plus a final entry for the end
+        # of the text. A segment is one matched key or a run of unmatched characters.
+        # Offsets are stored in blocks, relative to the bases of their block.
+        self._bases = [0]
+        self._out_bases = [0]
+        self._blocks = [[0]]
+        self._out_blocks = [[0]]
+
+    def _find(self, position: int, lo: int = 0) -> Tuple[int, int]:
+        """(block, index) of the last segment boundary at or before source offset position."""
+        block = bisect_right(self._bases, position, lo) - 1
+        return block, bisect_right(self._blocks[block], position - self._bases[block]) - 1
+
+    def update(self, text: str) -> Tuple[int, int, str]:
+        """
+        Transliterate the new version of the document.
+        Returns the change to the output as (start, removed, inserted): replacing
+        `removed` characters at `start` of the previous output with `inserted`
+        gives the new output.
+        """
+        old = self.text
+        if text == old:
+            return 0, 0, ""
+
+        prefix = _common_prefix_length(old, text)
+        suffix = _common_suffix_length(old, text, min(len(old), len(text)) - prefix)
+        new_edit_end = len(text) - suffix
+        delta = len(text) - len(old)
+        bases, out_bases = self._bases, self._out_bases
+        blocks, out_blocks = self._blocks, self._out_blocks
+
+        # Segments that end MAX_KEY_LENGTH - 1 or more characters before the edit never
+        # looked at it, so scanning restarts at the last segment boundary before that
+        first_block, first = self._find(max(0, prefix - self.matcher.max_key_length + 1))
+        pos = bases[first_block] + blocks[first_block][first]
+        out_pos = out_bases[first_block] + out_blocks[first_block][first]
+        out_start = out_pos
+
+        search = self.matcher.pattern.search
+        tokens = self.matcher.tokens
+        text_len = len(text)
+        new_starts: List[int] = []
+        new_out_starts: List[int] = []
+        pieces: List[str] = []
+        # The end of the text, unless the scan rejoins the old segmentation earlier
+        rejoin_block, rejoin = len(blocks) - 1, len(blocks[-1]) - 1
+        while pos < text_len:
+            if pos >= new_edit_end:
+                # Past the edit the text is unchanged, so once the scan lands on an old
+                # boundary the rest of the old segmentation is still valid
+                block, index = self._find(pos - delta, first_block)
+                if (blocks[block][index] == pos - delta - bases[block]
+                        and (block, index) != (rejoin_block, rejoin)):
+                    rejoin_block, rejoin = block, index
                     break
-        
-        if not matched:
-            # If no match found, keep the original character
-            result.append(text[i])
-            i += 1
-    
-    return "".join(result)
+            new_starts.append(pos)
+            new_out_starts.append(out_pos)
+            match = search(text, pos)
+            if match is None:
+                piece, pos = text[pos:], text_len
+            elif match.start() > pos:
+                piece, pos = text[pos:match.start()], match.start()
+            else:
+                piece, pos = tokens[match.group()], match.end()
+            pieces.append(piece)
+            out_pos += len(piece)
+
+        out_end = out_bases[rejoin_block] + out_blocks[rejoin_block][rejoin]
+        inserted = "".join(pieces)
+        out_delta = out_pos - out_end
+
+        # Rebuild only the blocks from first to rejoin, taking in the next block too if
+        # they would come out short, and shift the bases of the blocks after them
+        end_block = rejoin_block + 1
+        base, out_base = bases[first_block], out_bases[first_block]
+        starts = [base + start for start in blocks[first_block][:first]] + new_starts
+        out_starts = [out_base + start for start in out_blocks[first_block][:first]] + new_out_starts
+        base, out_base = bases[rejoin_block] + delta, out_bases[rejoin_block] + out_delta
+        starts += [base + start for start in blocks[rejoin_block][rejoin:]]
+        out_starts += [out_base + start for start in out_blocks[rejoin_block][rejoin:]]
+        size = self.BLOCK_SIZE
+        if len(starts) < size // 2 and end_block < len(blocks):
+            base, out_base = bases[end_block] + delta, out_bases[end_block] + out_delta
+            starts += [base + start for start in blocks[end_block]]
+            out_starts += [out_base + start for start in out_blocks[end_block]]
+            end_block += 1
+        # Split into blocks of equal length, so none of them is left much shorter
+        count = -(-len(starts) // size)
+        step = -(-len(starts) // count)
+        new_bases = starts[::step]
+        new_out_bases = out_starts[::step]
+        bases[first_block:end_block] = new_bases
+        out_bases[first_block:end_block] = new_out_bases
+        blocks[first_block:end_block] = [[start - base for start in starts[index:index + step]]
+                                         for base, index in zip(new_bases, range(0, len(starts), step))]
+        out_blocks[first_block:end_block] = [[start - base for start in out_starts[index:index + step]]
+                                             for base, index in zip(new_out_bases, range(0, len(starts), step))]
+        after = first_block + len(new_bases)
+        if delta:
+            bases[after:] = [base + delta for base in bases[after:]]
+        if out_delta:
+            out_bases[after:] = [base + out_delta for base in out_bases[after:]]
+
+        self.text = text
+        self.output = self.output[:out_start] + inserted + self.output[out_end:]
+        return out_start, out_end - out_start, inserted
+
+
+def invert_mapping(mapping: Dict[str, str]) -> Dict[str, Tuple[str, ...]]:
+    """
+    Map every value to the keys that produce it, canonical key first. The map lists
+    each letter's main spelling before its alternatives ('ii' before 'ie', 'k/R'
+    before 'kru'), so the keys keep their order in the map.
+    """
+    keys: Dict[str, Tuple[str, ...]] = {}
+    for key, value in mapping.items():
+        keys[value] = keys.get(value, ()) + (key,)
+    return keys
+
+
+def _value_order(mapping: Dict[str, str]) -> str:
+    """
+    Branch order for a trie of the mapping's values. Each character ranks with the
+    shortest key that writes it, so letters that are quickest to type are tried first.
+    """
+    keys = sorted(mapping, key=lambda key: (len(key), [_branch_key(char) for char in key]))
+    return "".join(dict.fromkeys(char for key in keys for char in mapping[key]))
+
+
+def _continuations(node: dict, prefix: str = "") -> Iterator[str]:
+    """Yield every longer key below a trie node, without the node's own prefix."""
+    for char, child in node.items():
+        if char:
+            if "" in child:
+                yield prefix + char
+            yield from _continuations(child, prefix + char)
+
+
+class ReverseMatcher:
+    """
+    Greedy longest-match from Sinhala back to the keys of a mapping.
+    Values are matched like keys are in Matcher, longest first, so conjuncts such as
+    ක්‍ර are one match. Each match is then written as its canonical key unless the
+    romanised text after it would extend that key into a longer one ('va' before 'e'
+    reads as 'vae'), in which case the first alternative that reads back correctly
+    is used. Keys are chosen right to left, so the text after every match is known.
+    """
+
+    def __init__(self, mapping: Dict[str, str] = TRANSLITERATION_MAP):
+        self.mapping = mapping
+        self.keys = invert_mapping(mapping)
+        # How much romanised text after a key can turn it into a longer key
+        self.lookahead = max(map(len, mapping), default=1) - 1
+        self.pattern = re.compile(matcher_regex(self.keys, _value_order(mapping)))
+        trie = build_trie(mapping)
+
+        def options(key: str) -> Tuple[str, frozenset, Tuple[str, ...]]:
+            node = trie
+            for char in key:
+                node = node[char]
+            continuations = tuple(_continuations(node))
+            return key, frozenset(c[0] for c in continuations), continuations
+        self._options = {value: tuple(map(options, keys)) for value, keys in self.keys.items()}
+
+        # Characters that occur in values but start none, such as vowel signs
+        signs = set("".join(self.keys)) - {value[0] for value in self.keys}
+        self._sign = re.compile("[" + "".join(map(re.escape, sorted(signs))) + "]")
+
+        # Characters in neither the keys nor the values. No match on either side can
+        # span one, so text can be cut right after one without changing the result.
+        alphabet = sorted(set("".join(mapping)) | set("".join(self.keys)))
+        self._last_separator = re.compile("(?s:.*)[^" + "".join(map(re.escape, alphabet)) + "]")
+
+    def detransliterate(self, text: str) -> str:
+        if not text:
+            return ""
+        parts = self.pattern.split(text)
+        unmatched = "".join(parts[2::2])
+        if self._sign.search(unmatched):
+            self._resegment(parts, unmatched)
+        options = self._options
+        end = len(parts)
+        # Every part after the current one is already romanised. Odd indexes hold the
+        # matches and even indexes the unmatched text, which is often empty.
+        for index in range(end - 2, 0, -2):
+            choices = options[parts[index]]
+            key, firsts, continuations = choices[0]
+            after = parts[index + 1] or (parts[index + 2] if index + 2 < end else "")
+            if after[:1] in firsts:
+                # Each part is at least one character long, except empty unmatched runs
+                tail = "".join(parts[index + 1:index + 1 + 2 * self.lookahead])
+                for key, firsts, continuations in choices:
+                    if not tail.startswith(continuations):
+                        break
+                else:
+                    # No spelling survives what follows, keep the canonical one
+                    key = choices[0][0]
+            parts[index] = key
+        return "".join(parts)
+
+    def _resegment(self, parts: List[str], unmatched: str):
+        """
+        Shorten matches that leave a vowel sign unmatched after them. Longest-match can
+        take a letter that belongs with the sign that follows: the map has no key for
+        ර්‍ර + ූ, but it has one for ර්‍ and one for රූ.
+        `unmatched` is the unmatched text after the first match, parts[2::2] joined.
+        """
+        # Offsets in `unmatched` where each unmatched part ends, to find the matches
+        # directly before a sign without walking every part
+        ends = list(accumulate(map(len, parts[2::2])))
+        indexes = []
+        for sign in self._sign.finditer(unmatched):
+            run = bisect_right(ends, sign.start())
+            if ends[run] - len(parts[2 * run + 2]) == sign.start():
+                indexes.append(2 * run + 1)
+        # Right to left, so splicing never moves a match that is still to be fixed
+        for index in reversed(indexes):
+            after = parts[index + 1]
+            value = parts[index]
+            for cut in range(len(value) - 1, 0, -1):
+                if value[:cut] not in self.keys:
+                    continue
+                rest = self.pattern.split(value[cut:] + after)
+                # Take the shorter match only if the next one now swallows the sign
+                if not rest[0] and len(rest) > 1 and len(rest[1]) > len(value) - cut:
+                    parts[index:index + 2] = [value[:cut]] + rest
+                    break
+
+    def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Detransliterate text arriving in chunks, yielding output as it becomes final.
+        Each chunk is converted up to its last separator, such as a space or punctuation,
+        and the rest is carried over to the next chunk.
+        """
+        carry = ""
+        for chunk in chunks:
+            buffer = carry + chunk if carry else chunk
+            match = self._last_separator.match(buffer)
+            if match is None:
+                carry = buffer
+                continue
+            carry = buffer[match.end():]
+            yield self.detransliterate(buffer[:match.end()])
+        if carry:
+            yield self.detransliterate(carry)
+
+
+_reverse_matcher: Optional[ReverseMatcher] = None
+
+
+def get_reverse_matcher() -> ReverseMatcher:
+    """Return the reverse matcher for TRANSLITERATION_MAP, building it on first use."""
+    global _reverse_matcher
+    if _reverse_matcher is None:
+        _reverse_matcher = ReverseMatcher(TRANSLITERATION_MAP)
+    return _reverse_matcher
+
+
+def detransliterate(text: str) -> str:
+    """
+    Transliterate Sinhala text back to Singlish.
+    For text produced by transliterate(), transliterating the result again gives the
+    same Sinhala text back. English letters come back as //-escapes.
+    """
+    if not text:
+        return ""
+    return get_reverse_matcher().detransliterate(text)
+
+
+def detransliterate_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Detransliterate an iterable of text chunks lazily.
+    Joining the yielded pieces gives the same result as detransliterate() on the
+    joined input, whatever the chunk boundaries are.
+    """
+    return get_reverse_matcher().stream(chunks)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for `python -m singlish`."""
+    import argparse
+    import singlish_convert
+    import singlish_scheme
+    import singlish_server
+
+    parser = argparse.ArgumentParser(prog="python -m singlish", description="English to Sinhala transliterator")
+    parser.add_argument("--trace", metavar="FILE", help="record timings of the engine and write them to FILE at exit")
+    parser.add_argument("--trace-format", choices=("chrome", "json"),
+                        help="format of the --trace file (default: chrome, viewable with python -m singlish_trace)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    singlish_convert.add_parser(commands)
+    singlish_server.add_parser(commands)
+    singlish_scheme.add_parser(commands)
+    table = commands.add_parser("build-table", help="precompile the matcher into a table file")
+    table.add_argument("-o", "--output", default=TABLE_PATH, help=f"table file to write (default: {TABLE_FILE} next to singlish.py)")
+    table.set_defaults(handler=lambda args: build_table(args.output) or 0)
+    args = parser.parse_args(argv)
+    if args.trace or os.environ.get("SINGLISH_TRACE"):
+        import singlish_trace
+        singlish_trace.enable(args.trace or os.environ["SINGLISH_TRACE"], args.trace_format)
+
+    if args.command is None:
+        # Example usage
+        test_text = "mama gedara yanawa"
+        result = transliterate(test_text)
+        print(f"Input: {test_text}")
+        print(f"Output: {result}")
+        return 0
+    return args.handler(args)
+
+
+if os.environ.get("SINGLISH_TRACE"):
+    # Trace any program that uses the engine, not only the ones with a --trace option
+    import singlish_trace
+    singlish_trace.enable_from_environment()
 
 if __name__ == "__main__":
-    # Example usage
-    test_text = "mama gedara yanawa"
-    result = transliterate(test_text)
-    print(f"Input: {test_text}")
-    print(f"Output: {result}")
+    # Run main() of the imported module, which the other modules share and which
+    # singlish_trace instruments, rather than of this __main__ copy
+    import singlish
+    sys.exit(singlish.main())
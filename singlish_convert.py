@@ -0,0 +1,228 @@
+"""
+Bulk converter behind `python -m singlish convert`.
+
+Files are cut into pieces right after ASCII whitespace bytes. No transliteration key
+contains whitespace, so a match can never span such a cut, and UTF-8 never uses these
+bytes inside a multi-byte character. Every piece can therefore be transliterated on its
+own, in any process, and joining the pieces in order gives exactly the serial result.
+"""
+import os
+import re
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+from typing import List, Tuple
+
+from singlish import transliterate
+
+# Files larger than this many bytes are split into several pieces
+PIECE_SIZE = 4 << 20
+
+# How far past a piece boundary to read at a time while looking for whitespace
+SCAN_BLOCK = 64 << 10
+
+WHITESPACE = re.compile(rb"[ \t\n\r\x0b\x0c]")
+
+
+def find_pieces(path: str, piece_size: int = PIECE_SIZE) -> List[Tuple[str, int, int]]:
+    """Split a file into (path, start, end) byte ranges that each end just after whitespace."""
+    size = os.path.getsize(path)
+    pieces = []
+    start = 0
+    with open(path, "rb") as file:
+        while size - start > piece_size:
+            position = start + piece_size
+            file.seek(position)
+            end = size
+            while position < size:
+                block = file.read(SCAN_BLOCK)
+                match = WHITESPACE.search(block)
+                if match:
+                    end = position + match.end()
+                    break
+                position += len(block)
+            pieces.append((path, start, end))
+            start = end
+    if start < size:
+        pieces.append((path, start, size))
+    return pieces
+
+
+def convert_piece(piece: Tuple[str, int, int]) -> Tuple[int, bytes]:
+    """Transliterate one byte range of a UTF-8 file. Returns (characters read, UTF-8 output)."""
+    path, start, end = piece
+    with open(path, "rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode("utf-8")
+    return len(text), transliterate(text).encode("utf-8")
+
+
+# Set in pool workers by _start_worker() when the parent is tracing
+_worker_tracing = False
+
+
+def _start_worker(trace: bool):
+    global _worker_tracing
+    if trace:
+        import singlish_trace
+        singlish_trace.start_worker()
+        _worker_tracing = True
+
+
+def _convert_in_worker(piece: Tuple[str, int, int]):
+    """
+    convert_piece() in a pool worker, plus what the worker traced for the parent to merge.
+    A piece that is not valid UTF-8 comes back as its UnicodeDecodeError in place of the
+    output, so the remaining pieces are still converted.
+    """
+    try:
+        count, output = convert_piece(piece)
+    except UnicodeDecodeError as error:
+        count, output = 0, error
+    if not _worker_tracing:
+        return count, output, None
+    import singlish_trace
+    return count, output, singlish_trace.drain()
+
+
+def collect_files(inputs: List[str], output_dir: str, pattern: str) -> List[Tuple[str, str]]:
+    """Expand the input files and directories into (source, destination) pairs."""
+    pairs = []
+    for name in inputs:
+        source = Path(name)
+        if source.is_dir():
+            for path in sorted(source.rglob(pattern)):
+                if path.is_file():
+                    pairs.append((str(path), os.path.join(output_dir, str(path.relative_to(source)))))
+        else:
+            pairs.append((str(source), os.path.join(output_dir, source.name)))
+    return pairs
+
+
+def check_pairs(pairs: List[Tuple[str, str]]):
+    """
+    Raise ValueError if a destination is its own source, which opening it for writing
+    would truncate before it is read, or if two sources would be written to one file.
+    """
+    sources = {}
+    for source, destination in pairs:
+        real = os.path.realpath(destination)
+        if real == os.path.realpath(source) or os.path.exists(destination) and os.path.samefile(source, destination):
+            raise ValueError(f"{source} would be overwritten by its own output; choose another output directory")
+        if real in sources:
+            raise ValueError(f"{sources[real]} and {source} would both be written to {destination}")
+        sources[real] = source
+
+
+def report_progress(done: int, total: int, chars: int, started: float):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    sys.stderr.write(f"\r[{done}/{total}] {chars:,} chars, {chars / elapsed:,.0f} chars/s")
+    sys.stderr.flush()
+
+
+def convert(pairs: List[Tuple[str, str]], jobs: int = 1, piece_size: int = PIECE_SIZE,
+            progress: bool = True) -> Tuple[int, float, List[Tuple[str, str]]]:
+    """
+    Transliterate every (source, destination) pair, using a pool of `jobs` worker
+    processes when jobs > 1. Returns (characters converted, seconds taken, failures).
+
+    A source that is not valid UTF-8 is skipped and listed in failures as (source,
+    reason); its destination is left as it was. Every file is written to destination.part
+    first and only renamed to its destination once complete.
+    Raises ValueError before writing anything if the pairs fail check_pairs().
+    """
+    check_pairs(pairs)
+    started = time.perf_counter()
+    plan = [(source, destination, find_pieces(source, piece_size)) for source, destination in pairs]
+    pieces = [piece for _, _, file_pieces in plan for piece in file_pieces]
+
+    pool = None
+    if jobs > 1 and len(pieces) > 1:
+        trace = sys.modules.get("singlish_trace")
+        pool = Pool(jobs, initializer=_start_worker, initargs=(trace is not None and trace.enabled(),))
+        # Hand out several small files per task so IPC does not dominate
+        results = pool.imap(_convert_in_worker, pieces, chunksize=max(1, len(pieces) // (jobs * 8)))
+    else:
+        results = map(_convert_in_worker, pieces)
+
+    chars = 0
+    done = 0
+    failures = []
+    try:
+        # imap yields results in submission order, so each file is reassembled in order
+        for source, destination, file_pieces in plan:
+            os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+            temporary = destination + ".part"
+            error = None
+            try:
+                with open(temporary, "wb") as target:
+                    # Results of the pieces after an error are still taken, to keep the order
+                    for (_, start, _), (count, output, trace) in zip(file_pieces, results):
+                        if trace:
+                            sys.modules["singlish_trace"].merge(trace)
+                        done += 1
+                        if isinstance(output, UnicodeDecodeError):
+                            error = error or f"not valid UTF-8 at byte {start + output.start}"
+                            continue
+                        if error is None:
+                            target.write(output)
+                            chars += count
+                        if progress:
+                            report_progress(done, len(pieces), chars, started)
+                if error is None:
+                    os.replace(temporary, destination)
+            finally:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+            if error is not None:
+                failures.append((source, error))
+                if progress:
+                    sys.stderr.write("\n")
+                print(f"Skipped {source}: {error}", file=sys.stderr)
+    except BaseException:
+        if pool is not None:
+            # Do not wait for the pieces still queued
+            pool.terminate()
+            pool = None
+        raise
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if progress and pieces:
+        sys.stderr.write("\n")
+    return chars, time.perf_counter() - started, failures
+
+
+def add_parser(commands):
+    """Register the convert command on the subparsers of the singlish command line."""
+    parser = commands.add_parser("convert", help="transliterate UTF-8 files or directories of files")
+    parser.add_argument("inputs", nargs="+", help="files or directories to convert")
+    parser.add_argument("-o", "--output-dir", required=True, help="directory to write the converted files to")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: all cores, 1 converts serially)")
+    parser.add_argument("--pattern", default="*.txt", help="file name pattern used inside directories (default: *.txt)")
+    parser.add_argument("--piece-size", type=int, default=PIECE_SIZE,
+                        help="split files larger than this many bytes across workers")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    parser.set_defaults(handler=run)
+    return parser
+
+
+def run(args) -> int:
+    pairs = collect_files(args.inputs, args.output_dir, args.pattern)
+    if not pairs:
+        print("No files to convert.", file=sys.stderr)
+        return 1
+    try:
+        chars, seconds, failures = convert(pairs, max(1, args.jobs), args.piece_size, progress=not args.quiet)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Converted {len(pairs) - len(failures)} files, {chars:,} chars in {seconds:.2f} s "
+          f"({chars / max(seconds, 1e-9):,.0f} chars/s)")
+    if failures:
+        print(f"Skipped {len(failures)} files that are not valid UTF-8", file=sys.stderr)
+        return 1
+    return 0
@@ -13,19 +13,26 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
+import argparse
 import os
+import re
 import sys
 import json  # Import JSON for saving/loading preferences
+import threading
+import time
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QTextEdit,
     QPushButton, QMessageBox
 )
-from PyQt6.QtCore import Qt, QTimer, QSize
-from PyQt6.QtGui import QFont
-from singlish import transliterate
-from history_window import HistoryWindow  # Import the HistoryWindow class
+from PyQt6.QtCore import Qt, QTimer, QSize, QThread, QObject, QEvent, pyqtSignal
+from PyQt6.QtGui import QFont, QTextCursor
+from singlish import IncrementalTransliterator, text_change, transliterate
 from PyQt6.QtGui import QIcon
-from styles import LIGHT_MODE_STYLE, DARK_MODE_STYLE  # Import styles
+from styles import (  # Import styles
+    LIGHT_MODE_STYLE, DARK_MODE_STYLE, LIGHT_MODE_POPUP_STYLE, DARK_MODE_POPUP_STYLE,
+    LIGHT_MODE_MESSAGE_BOX_STYLE, DARK_MODE_MESSAGE_BOX_STYLE
+)
+# history_window and history_store are imported on first use, they are not needed to show the window
 
 def resource_path(relative_path):
     """Get the absolute path to a resource, works for both development and PyInstaller."""
@@ -43,9 +50,101 @@ def resource_path(relative_path):
         print(f"Resource not found: {path}")
     return path
 
+# Text of the help dialog
+HELP_TEXT = """How to use the Sinhala Transliterator:<br><br>
+1. Type or paste English text in the top box.<br><br>
+
+2. Basic vowels:<br>
+   - a -> අ, aa -> ආ, A / ae -> ඇ, Ae / aea -> ඈ<br>
+   - i -> ඉ, ii / ie -> ඊ<br>
+   - u -> උ, uu -> ඌ<br>
+   - e -> එ, ea -> ඒ<br>
+   - o -> ඔ, oe -> ඕ<br>
+<br>
+3. Consonants:<br>
+   - k -> ක්, g -> ග්, ch -> ච්<br>
+   - t -> ට්, d -> ඩ්<br>
+   - n -> න්, p -> ප්, b -> බ්<br>
+   - m -> ම්, y -> ය්, r -> ර්<br>
+   - l -> ල්, w/v -> ව්, s -> ස්<br>
+<br>
+4. Special combinations:<br>
+   - Type 'ga' for ග, 'gi' for ගි<br>
+   - Type 'ma' for ම, 'mi' for මි<br>
+   - Type 'nndha' for ඳ, 'Ba' for ඹ<br>
+<br>
+Note: Use capital letters for special characters like 'A' for ඇ.<br>
+<br>
+<br>
+For English letters<br>
+    - Type '//A' for A, '//a' for a<br>
+<br>
+For the full Transliteration Scheme, click this links<br><br>
+<a href="https://raw.githubusercontent.com/ssvjaya/Singlish/939ebf327a403105a7e6c841de903936d8ab19c9/resources/Transliteration/Transliteration%20Scheme_1.png" style="color:#1a73e8;">Transliteration Map 1</a><br>
+<br>
+<a href="https://raw.githubusercontent.com/ssvjaya/Singlish/939ebf327a403105a7e6c841de903936d8ab19c9/resources/Transliteration/Transliteration%20Scheme_2.png" style="color:#1a73e8;">Transliteration Map 2</a>
+"""
+
+# Characters outside the Basic Multilingual Plane, which take two UTF-16 code units
+ASTRAL_CHARS = re.compile("[\U00010000-\U0010FFFF]")
+
+def qt_text_position(text, index):
+    """Convert a Python string index into a Qt text position, which counts UTF-16 code units."""
+    return index + len(ASTRAL_CHARS.findall(text, 0, index))
+
+class TransliterationWorker(QThread):
+    """Transliterates on a background thread so typing and pasting never block the window."""
+    # Generation number of the request, the Sinhala text, and the change from the
+    # result emitted before as (generation of that result, start, removed, inserted).
+    # The text is sent as a Python object so large documents are not copied into a
+    # QString and back.
+    transliterated = pyqtSignal(int, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._condition = threading.Condition()
+        self._pending = None  # Newest (generation, text) not yet picked up by the thread
+        self._stopping = False
+        self._transliterator = None  # Created on the thread, so loading the matcher does not delay startup
+
+    def submit(self, generation, text):
+        """Queue text for transliteration, replacing any older request that has not started yet."""
+        with self._condition:
+            self._pending = (generation, text)
+            self._condition.notify()
+
+    def stop(self):
+        """Stop the thread and wait for it to finish."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        self._transliterator = IncrementalTransliterator()
+        emitted = 0  # Generation of the last result, whose output update() changes
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                generation, text = self._pending
+                self._pending = None
+            start, removed, inserted = self._transliterator.update(text)
+            self.transliterated.emit(generation, self._transliterator.output, (emitted, start, removed, inserted))
+            emitted = generation
+
 class TransliteratorGUI(QMainWindow):
     CONFIG_FILE = "config.json"  # Configuration file to store user preferences
 
+    # Delay before re-transliterating after an edit, scaled to the document size so short
+    # texts update almost at once and long ones wait for a pause in typing. Each value
+    # can be overridden by the config file key of the same name in lowercase.
+    DEBOUNCE_MIN_MS = 10
+    DEBOUNCE_MAX_MS = 250
+    DEBOUNCE_CHARS_PER_MS = 200  # Every 200 characters add 1 ms
+
     def __init__(self):
         super().__init__()
         # Load user preferences
@@ -139,7 +238,7 @@ class TransliteratorGUI(QMainWindow):
 
         self.english_text = QTextEdit()
         self.english_text.setFont(QFont("Arial", 12))  # Use Arial font
-        self.english_text.textChanged.connect(self.update_text)
+        self.english_text.textChanged.connect(self.schedule_update)
         self.main_layout.addWidget(self.english_text)
         self.english_label.setMinimumSize(0, 20)  # Set a minimum height for the label
 
@@ -191,6 +290,28 @@ class TransliteratorGUI(QMainWindow):
         # Initialize history list
         self.history = []
 
+        # Typing history database, opened on first use and kept open for the lifetime of the window
+        self._history_store = None
+        self.history_window = None
+        self.help_box = None
+        self.help_box_dark_mode = None
+
+        # Transliteration runs on a worker thread. Every edit gets a new generation
+        # number and results for anything but the newest generation are dropped.
+        self.generation = 0
+        self.shown_generation = 0
+        self.displayed_sinhala = ""
+        self.last_text = ""  # Last English text sent for transliteration, to skip redundant updates
+        self.worker = TransliterationWorker(self)
+        self.worker.transliterated.connect(self.show_sinhala, Qt.ConnectionType.QueuedConnection)
+        self.worker.start()
+
+        # Debounce timer, restarted on every edit
+        self.load_debounce_settings()
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.timeout.connect(self.update_text)
+
         # Apply initial styling (based on loaded preference)
         self.apply_styling(self.dark_mode)
 
@@ -205,14 +326,36 @@ class TransliteratorGUI(QMainWindow):
                 print("Error loading configuration file. Defaulting to light mode.")
         return False  # Default to light mode
 
+    def read_config(self):
+        """Read the configuration file as a dictionary, empty if it is missing or unreadable."""
+        if os.path.exists(self.CONFIG_FILE):
+            try:
+                with open(self.CONFIG_FILE, "r") as file:
+                    config = json.load(file)
+                    if isinstance(config, dict):
+                        return config
+            except (json.JSONDecodeError, IOError):
+                pass
+        return {}
+
     def save_theme_preference(self):
-        """Save the user's theme preference to the configuration file."""
+        """Save the user's theme preference to the configuration file, keeping its other settings."""
+        config = self.read_config()
+        config["dark_mode"] = self.dark_mode
         try:
             with open(self.CONFIG_FILE, "w") as file:
-                json.dump({"dark_mode": self.dark_mode}, file)
+                json.dump(config, file)
         except IOError:
             print("Error saving configuration file.")
 
+    def load_debounce_settings(self):
+        """Apply debounce settings from the configuration file over the class defaults."""
+        config = self.read_config()
+        for name in ("DEBOUNCE_MIN_MS", "DEBOUNCE_MAX_MS", "DEBOUNCE_CHARS_PER_MS"):
+            value = config.get(name.lower())
+            if isinstance(value, int) and value >= 0:
+                setattr(self, name, value)
+
     def start_drag(self, event):
         """Start dragging the window when the left mouse button is pressed."""
         if event.button() == Qt.MouseButton.LeftButton:
@@ -243,43 +386,90 @@ class TransliteratorGUI(QMainWindow):
         else:
             self.setStyleSheet(LIGHT_MODE_STYLE)
 
+    def schedule_update(self):
+        """Restart the debounce timer, with a delay that grows with the document size."""
+        length = self.english_text.document().characterCount()
+        delay = self.DEBOUNCE_MIN_MS + length // max(1, self.DEBOUNCE_CHARS_PER_MS)
+        self.update_timer.start(min(delay, max(self.DEBOUNCE_MAX_MS, self.DEBOUNCE_MIN_MS)))
+
     def update_text(self):
         english = self.english_text.toPlainText().strip()
-        sinhala = transliterate(english) if english else ""
-        self.sinhala_text.setPlainText(sinhala)
+        # Only transliterate if the text has changed
+        if english == self.last_text:
+            return
+        self.last_text = english
+        self.generation += 1
+        self.worker.submit(self.generation, english)
+
+    def flush_update(self):
+        """Bring the Sinhala text up to date right away, for actions that read it."""
+        self.update_timer.stop()
+        self.update_text()
+        if self.shown_generation != self.generation:
+            # The worker has not caught up yet, so transliterate the newest text here
+            self.show_sinhala(self.generation, transliterate(self.last_text))
+
+    def show_sinhala(self, generation, sinhala, change=None):
+        """
+        Show a result from the worker thread unless the text has changed since it was
+        requested. The worker's change applies if the result it was made from is the one
+        on screen; after a dropped result the change is worked out from the texts.
+        """
+        if generation != self.generation or generation == self.shown_generation:
+            return
+        previous = self.displayed_sinhala
+        if change is not None and change[0] == self.shown_generation:
+            start, removed, inserted = change[1:]
+        else:
+            start, removed, inserted = text_change(previous, sinhala)
+        self.shown_generation = generation
+        if not removed and not inserted:
+            return
+        scrollbar = self.sinhala_text.verticalScrollBar()
+        # Keep following the end of the output only if the user has not scrolled away from it
+        following = scrollbar.value() >= scrollbar.maximum()
+        scroll_position = scrollbar.value()
+        # Replace only the changed range of the Sinhala text instead of the whole document.
+        # Only the blocks in that range are laid out again, and the user's selection,
+        # held by the view's own cursor, is moved along by the document.
+        cursor = QTextCursor(self.sinhala_text.document())
+        cursor.beginEditBlock()
+        qt_start = qt_text_position(previous, start)
+        qt_end = qt_start + removed + len(ASTRAL_CHARS.findall(previous, start, start + removed))
+        cursor.setPosition(qt_start)
+        cursor.setPosition(qt_end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(inserted)
+        cursor.endEditBlock()
+        self.displayed_sinhala = sinhala
+        if following:
+            self.scroll_to_bottom()
+        else:
+            scrollbar.setValue(scroll_position)
+
+    def scroll_to_bottom(self):
         scrollbar = self.sinhala_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
 
     def clear_text(self):
         self.english_text.clear()
         self.sinhala_text.clear()
+        self.displayed_sinhala = ""
+        self.shown_generation = -1  # The empty box is no result the worker made
+        self.flush_update()
 
     def copy_sinhala(self):
-        sinhala_text = self.sinhala_text.toPlainText().strip()
+        self.flush_update()
+        sinhala_text = self.displayed_sinhala.strip()
         if sinhala_text:
             QApplication.clipboard().setText(sinhala_text)
-            # Add directly to the database
-            history_window = HistoryWindow([], self.dark_mode)
-            history_window.add_history_item(sinhala_text)
-            history_window.close()  # Ensure the database connection is closed
+            # Only queued here; the store's writer thread saves it with its next batch
+            self.history_store.add(sinhala_text, self.last_text.strip())
             self.show_popup_message("Sinhala text copied to clipboard!")
 
     def show_popup_message(self, message):
         popup = QLabel(message, self)
         popup.setFont(QFont("Arial", 12))  # Use Arial font
-        popup.setStyleSheet("""
-            QLabel {
-                background-color: #444444; color: white; 
-                border-radius: 5px; padding: 10px; border-radius: 5px;
-                
-            }
-        """ if self.dark_mode else """
-            QLabel {
-                background-color: #E0E0E0; color: black; 
-                border-radius: 5px; padding: 10px; border-radius: 5px;
-                
-            }
-        """)
+        popup.setStyleSheet(DARK_MODE_POPUP_STYLE if self.dark_mode else LIGHT_MODE_POPUP_STYLE)
         popup.setAlignment(Qt.AlignmentFlag.AlignCenter)
         popup.setFixedSize(300, 50)
         popup.move(self.width() // 2 - popup.width() // 2, self.height() // 2 - popup.height() // 2)
@@ -289,77 +479,24 @@ class TransliteratorGUI(QMainWindow):
         QTimer.singleShot(2000, popup.deleteLater)
 
     def show_help(self):
-        help_text = """How to use the Sinhala Transliterator:<br><br>
-1. Type or paste English text in the top box.<br><br>
-
-2. Basic vowels:<br>
-   - a -> අ, aa -> ආ, A / ae -> ඇ, Ae / aea -> ඈ<br>
-   - i -> ඉ, ii / ie -> ඊ<br>
-   - u -> උ, uu -> ඌ<br>
-   - e -> එ, ea -> ඒ<br>
-   - o -> ඔ, oe -> ඕ<br>
-<br>
-3. Consonants:<br>
-   - k -> ක්, g -> ග්, ch -> ච්<br>
-   - t -> ට්, d -> ඩ්<br>
-   - n -> න්, p -> ප්, b -> බ්<br>
-   - m -> ම්, y -> ය්, r -> ර්<br>
-   - l -> ල්, w/v -> ව්, s -> ස්<br>
-<br>
-4. Special combinations:<br>
-   - Type 'ga' for ග, 'gi' for ගි<br>
-   - Type 'ma' for ම, 'mi' for මි<br>
-   - Type 'nndha' for ඳ, 'Ba' for ඹ<br>
-<br>
-Note: Use capital letters for special characters like 'A' for ඇ.<br>
-<br>
-<br>
-For English letters<br>
-    - Type '//A' for A, '//a' for a<br>
-<br>
-For the full Transliteration Scheme, click this links<br><br>
-<a href="https://raw.githubusercontent.com/ssvjaya/Singlish/939ebf327a403105a7e6c841de903936d8ab19c9/resources/Transliteration/Transliteration%20Scheme_1.png" style="color:#1a73e8;">Transliteration Map 1</a><br>
-<br>
-<a href="https://raw.githubusercontent.com/ssvjaya/Singlish/939ebf327a403105a7e6c841de903936d8ab19c9/resources/Transliteration/Transliteration%20Scheme_2.png" style="color:#1a73e8;">Transliteration Map 2</a>
-"""
-        self.show_message("Help", help_text)
+        # The dialog is built on first use and kept; it is only restyled after a theme change
+        if self.help_box is None or self.help_box_dark_mode != self.dark_mode:
+            self.help_box = self.build_message_box("Help", HELP_TEXT)
+            self.help_box_dark_mode = self.dark_mode
+        self.help_box.exec()
 
-    def show_message(self, title, text):
+    def build_message_box(self, title, text):
         msg_box = QMessageBox(self)
         msg_box.setWindowTitle(title)
         msg_box.setTextFormat(Qt.TextFormat.RichText)  # Enable rich text for clickable links
         msg_box.setText(text)
         msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
         msg_box.setTextInteractionFlags(Qt.TextInteractionFlag.TextBrowserInteraction)
-        if self.dark_mode:
-            msg_box.setStyleSheet("""
-                QMessageBox {
-                    background-color: #202020; color: white;
-                }
-                QPushButton {
-                    background-color: #444444; color: white; border: 2px solid #555555;
-                    border-radius: 5px; padding: 5px 10px;
-                }
-                QPushButton:hover {
-                    background-color: #555555;
-                }
-                a { color: #8ab4f8; }
-            """)
-        else:
-            msg_box.setStyleSheet("""
-                QMessageBox {
-                    background-color: #FDFDFD; color: black;
-                }
-                QPushButton {
-                    background-color: #E0E0E0; color: black; border: 2px solid #D0D0D0;
-                    border-radius: 5px; padding: 5px 10px;
-                }
-                QPushButton:hover {
-                    background-color: #D0D0D0;
-                }
-                a { color: #1a73e8; }
-            """)
-        msg_box.exec()
+        msg_box.setStyleSheet(DARK_MODE_MESSAGE_BOX_STYLE if self.dark_mode else LIGHT_MODE_MESSAGE_BOX_STYLE)
+        return msg_box
+
+    def show_message(self, title, text):
+        self.build_message_box(title, text).exec()
 
     def handle_maximize_button(self):
         """Toggle between maximized and normal window states when the maximize button is clicked."""
@@ -377,18 +514,86 @@ For the full Transliteration Scheme, click this links<br><br>
             else:
                 self.showMaximized()
 
+    @property
+    def history_store(self):
+        """The typing history database, opened the first time it is needed."""
+        if self._history_store is None:
+            from history_store import HistoryStore
+            # The config file can set the retention limits as history_max_rows,
+            # history_max_bytes and history_max_age_days (0 for no limit)
+            config = self.read_config()
+            limits = {}
+            for name in ("max_rows", "max_bytes", "max_age_days"):
+                value = config.get(f"history_{name}")
+                if isinstance(value, int) and value >= 0:
+                    limits[name] = value
+            self._history_store = HistoryStore(**limits)
+        return self._history_store
+
     def show_history(self):
-        history_window = HistoryWindow(self.history, self.dark_mode)
-        history_window.show()  # Use show() instead of exec()
+        if self.history_window is not None and self.history_window.isVisible():
+            self.history_window.raise_()
+            self.history_window.activateWindow()
+            return
+        from history_window import HistoryWindow
+        # Keep a reference, a window without a parent is destroyed along with its Python object
+        self.history_window = HistoryWindow(self.history, self.dark_mode, self.history_store)
+        self.history_window.show()  # Use show() instead of exec()
 
     def closeEvent(self, event):
-        """Ensure the theme preference is saved when the application closes."""
+        """Ensure the theme preference and queued history writes are saved when the application closes."""
         self.save_theme_preference()
+        self.worker.stop()
+        if self._history_store is not None:
+            self._history_store.close()
         super().closeEvent(event)
 
+class FirstPaintReporter(QObject):
+    """
+    Prints the time from SINGLISH_STARTUP_TIME (seconds since the epoch, set by the
+    launcher) to the window's first paint, then the time the first transliteration takes,
+    which includes loading the matcher, and quits. Used by benchmarks/bench_startup.py.
+    """
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            launched = os.environ.get("SINGLISH_STARTUP_TIME")
+            if launched:
+                print(f"first_paint_ms {(time.time() - float(launched)) * 1000:.1f}", flush=True)
+            start = time.perf_counter()
+            transliterate("mama gedara yanawa")
+            print(f"first_call_ms {(time.perf_counter() - start) * 1000:.1f}", flush=True)
+            QTimer.singleShot(0, QApplication.instance().quit)
+        return False
+
+def instrument_window(trace):
+    """Time each stage of the window's update cycle, see singlish_trace."""
+    trace.instrument(TransliteratorGUI, "__init__", "gui.build_window")
+    trace.instrument(TransliteratorGUI, "update_text", "gui.update_text")
+    trace.instrument(TransliteratorGUI, "show_sinhala", "gui.show_sinhala", lambda args, result: len(args[2]))
+    trace.instrument(TransliteratorGUI, "scroll_to_bottom", "gui.scroll_to_bottom")
+    trace.instrument(TransliteratorGUI, "apply_styling", "gui.apply_styling")
+    trace.instrument(TransliteratorGUI, "copy_sinhala", "gui.copy_sinhala")
+    trace.instrument(TransliteratorGUI, "show_history", "gui.show_history")
+
 def main():
-    app = QApplication([])
+    parser = argparse.ArgumentParser(description="Singlish Transliterator")
+    parser.add_argument("--trace", metavar="FILE", help="record timings of the update cycle and write them to FILE at exit")
+    parser.add_argument("--trace-format", choices=("chrome", "json"), help="format of the --trace file (default: chrome)")
+    # Anything else is left for Qt, such as -platform or -style
+    args, qt_args = parser.parse_known_args()
+    if args.trace or os.environ.get("SINGLISH_TRACE"):
+        import singlish_trace
+        singlish_trace.enable(args.trace or os.environ["SINGLISH_TRACE"], args.trace_format)
+        instrument_window(singlish_trace)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = TransliteratorGUI()
+    if os.environ.get("SINGLISH_EXIT_AFTER_STARTUP"):
+        # Quit once the window has been painted, used by benchmarks/bench_startup.py
+        reporter = FirstPaintReporter(window)
+        window.installEventFilter(reporter)
     window.show()
     app.exec()
 
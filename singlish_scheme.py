@@ -0,0 +1,299 @@
+"""
+Scheme compiler behind `python -m singlish scheme`.
+
+A scheme is a key -> value table like TRANSLITERATION_MAP, kept in a spreadsheet such
+as Singlish.xlsx, a CSV or JSON file, or a Python file holding the map literal. The
+compiler reads every entry with the place it came from, checks the table and writes
+the mapping as JSON or as a precompiled table that transliterate(text, scheme=path)
+loads without compiling anything.
+
+Matching is greedy longest-match, so no key can hide another one completely. What a
+longer key does hide is the output of its prefixes: typing "Kr" then "ii" must not
+switch the letter already written for "K". The checks flag such keys, along with
+duplicates, conflicting values and values that are not well-formed Sinhala.
+"""
+import ast
+import csv
+import json
+import os
+import sys
+import zipfile
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from xml.etree import ElementTree
+
+from singlish import build_table
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_RELATIONSHIP = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+VIRAMA = "්"
+ZWJ = "‍"
+# Vowel signs and the virama, which only ever follow a consonant
+SIGNS = frozenset([VIRAMA, "ෲ", "ෳ"] + [chr(code) for code in range(0x0dcf, 0x0de0)])
+
+
+class Entry(NamedTuple):
+    key: str
+    value: str
+    where: str  # e.g. "Singlish.xlsx:Sheet1!D7" or "scheme.csv:12"
+
+
+class Problem(NamedTuple):
+    level: str  # "error" or "warning"
+    where: str
+    message: str
+
+    def __str__(self):
+        return f"{self.where}: {self.level}: {self.message}"
+
+
+class SchemeError(ValueError):
+    """Raised by compile_scheme() when a scheme has errors. The problems are kept on it."""
+
+    def __init__(self, path: str, problems: List[Problem]):
+        errors = [problem for problem in problems if problem.level == "error"]
+        super().__init__(f"{path}: {len(errors)} errors, first: {errors[0]}")
+        self.problems = problems
+
+
+def _column(reference: str) -> int:
+    """Column number of a cell reference such as "AB12", counting from 1."""
+    number = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        number = number * 26 + ord(char.upper()) - 64
+    return number
+
+
+def _cell_text(cell: ElementTree.Element, shared: List[str]) -> str:
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(node.text or "" for node in cell.iter(f"{_MAIN}t"))
+    value = cell.find(f"{_MAIN}v")
+    if value is None or value.text is None:
+        return ""
+    return shared[int(value.text)] if kind == "s" else value.text
+
+
+def read_xlsx(path: str, sheet: Optional[str] = None) -> Iterator[Entry]:
+    """
+    Read key/value pairs from a workbook, using only the standard library.
+    On every row an ASCII key cell followed directly by a non-ASCII value cell is one
+    entry, so a sheet may hold any number of pairs side by side and notes in between.
+    The first worksheet is read unless another one is named.
+    """
+    with zipfile.ZipFile(path) as book:
+        shared = []
+        if "xl/sharedStrings.xml" in book.namelist():
+            for item in ElementTree.fromstring(book.read("xl/sharedStrings.xml")).iter(f"{_MAIN}si"):
+                # Plain text is a single <t>, rich text a run of <r><t>; skip phonetic <rPh> hints
+                shared.append("".join(node.text or "" for child in item if child.tag != f"{_MAIN}rPh"
+                                      for node in child.iter(f"{_MAIN}t")))
+        targets = {relation.get("Id"): relation.get("Target")
+                   for relation in ElementTree.fromstring(book.read("xl/_rels/workbook.xml.rels"))}
+        worksheets = [(item.get("name"), targets[item.get(_RELATIONSHIP)])
+                      for item in ElementTree.fromstring(book.read("xl/workbook.xml")).iter(f"{_MAIN}sheet")
+                      if "worksheets/" in targets.get(item.get(_RELATIONSHIP), "")]
+        if not worksheets:
+            raise ValueError(f"{path} has no worksheets")
+        if sheet is None:
+            name, target = worksheets[0]
+        else:
+            matches = [item for item in worksheets if item[0] == sheet]
+            if not matches:
+                raise ValueError(f"{path} has no sheet {sheet!r}, it has {', '.join(n for n, _ in worksheets)}")
+            name, target = matches[0]
+        target = target.lstrip("/") if target.startswith("/") else "xl/" + target
+        rows = ElementTree.fromstring(book.read(target)).iter(f"{_MAIN}row")
+
+        location = f"{os.path.basename(path)}:{name}"
+        for row in rows:
+            cells = [(_column(cell.get("r", "")), cell.get("r", ""), _cell_text(cell, shared).strip())
+                     for cell in row.iter(f"{_MAIN}c")]
+            for (column, reference, key), (next_column, _, value) in zip(cells, cells[1:]):
+                if (next_column == column + 1 and key and value and key.isascii()
+                        and not value.isascii()):
+                    yield Entry(key, value, f"{location}!{reference}")
+
+
+def read_csv(path: str) -> Iterator[Entry]:
+    """Read key,value rows. Blank rows, rows starting with # and a key,value header are skipped."""
+    name = os.path.basename(path)
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for number, row in enumerate(csv.reader(file), 1):
+            if not row or not "".join(row).strip() or row[0].startswith("#"):
+                continue
+            if number == 1 and [cell.strip().lower() for cell in row[:2]] == ["key", "value"]:
+                continue
+            if len(row) < 2:
+                row.append("")
+            yield Entry(row[0], row[1], f"{name}:{number}")
+
+
+def read_json(path: str) -> Iterator[Entry]:
+    """Read a JSON object of key: value pairs, duplicates included, or a list of [key, value] pairs."""
+    name = os.path.basename(path)
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file, object_pairs_hook=list)
+    if not isinstance(data, list) or not all(isinstance(pair, (list, tuple)) and len(pair) == 2
+                                             and all(isinstance(item, str) for item in pair)
+                                             for pair in data):
+        raise ValueError(f"{path} must hold an object of strings or a list of [key, value] pairs")
+    for number, (key, value) in enumerate(data, 1):
+        yield Entry(key, value, f"{name}#{number}")
+
+
+def read_python(path: str, variable: str = "TRANSLITERATION_MAP") -> Iterator[Entry]:
+    """Read the dict literal assigned to `variable`, duplicate keys included, as singlish.py holds it."""
+    name = os.path.basename(path)
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+        elif isinstance(node, ast.Assign):
+            targets = node.targets
+        else:
+            continue
+        if any(isinstance(target, ast.Name) and target.id == variable for target in targets):
+            if not isinstance(node.value, ast.Dict):
+                raise ValueError(f"{path}: {variable} is not a dict literal")
+            for key, value in zip(node.value.keys, node.value.values):
+                if not (isinstance(key, ast.Constant) and isinstance(key.value, str)
+                        and isinstance(value, ast.Constant) and isinstance(value.value, str)):
+                    raise ValueError(f"{name}:{getattr(key, 'lineno', node.lineno)}: "
+                                     "only string keys and values are supported")
+                yield Entry(key.value, value.value, f"{name}:{key.lineno}")
+            return
+    raise ValueError(f"{path} does not assign {variable}")
+
+
+def read_scheme(path: str, sheet: Optional[str] = None) -> List[Entry]:
+    """Read the entries of a scheme file in order, choosing the reader by file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return list(read_xlsx(path, sheet))
+    if extension in (".csv", ".tsv", ".txt"):
+        return list(read_csv(path))
+    if extension == ".json":
+        return list(read_json(path))
+    if extension == ".py":
+        return list(read_python(path))
+    raise ValueError(f"{path}: unknown scheme format, expected .xlsx, .csv, .json or .py")
+
+
+def _sinhala_problems(value: str) -> Iterator[str]:
+    """Ways in which a value is not a well-formed run of Sinhala syllables."""
+    if value[0] in SIGNS:
+        yield f"value {value!r} starts with a vowel sign"
+    for previous, char in zip(value, value[1:]):
+        if previous in SIGNS and char in SIGNS:
+            yield f"value {value!r} has two signs in a row ({previous!r} {char!r})"
+            break
+    if any(char == ZWJ and (index == 0 or value[index - 1] != VIRAMA) for index, char in enumerate(value)):
+        yield f"value {value!r} has a zero width joiner that does not follow a virama"
+
+
+def validate(entries: List[Entry]) -> List[Problem]:
+    """
+    Check a scheme's entries and return the problems found, in table order.
+    Errors stop compilation: empty keys or values, keys with whitespace in them and
+    keys given twice with different values. The rest are warnings.
+    """
+    problems = []
+    first: Dict[str, Entry] = {}
+    for entry in entries:
+        key, value, where = entry
+        if not key or not value:
+            problems.append(Problem("error", where, f"empty {'key' if not key else 'value'} in {key!r}: {value!r}"))
+            continue
+        if any(char.isspace() for char in key):
+            problems.append(Problem("error", where, f"key {key!r} contains whitespace"))
+            continue
+        if key in first:
+            earlier = first[key]
+            if earlier.value != value:
+                problems.append(Problem("error", where, f"key {key!r} is {value!r} here "
+                                        f"but {earlier.value!r} at {earlier.where}"))
+            else:
+                problems.append(Problem("warning", where, f"key {key!r} is repeated from {earlier.where}"))
+            continue
+        first[key] = entry
+        for message in _sinhala_problems(value):
+            problems.append(Problem("warning", where, message))
+
+    mapping = {key: entry.value for key, entry in first.items()}
+    for key, (_, value, where) in first.items():
+        if key.startswith("/") or len(key) < 2:
+            continue
+        # The longest shorter key that is a consonant with a virama: what has already
+        # been written when this key is half typed
+        prefix = next((key[:end] for end in range(len(key) - 1, 0, -1)
+                       if mapping.get(key[:end], "").endswith(VIRAMA)), None)
+        if prefix is None or (value.endswith(VIRAMA) and ZWJ not in value):
+            continue
+        base = mapping[prefix][:-1]
+        if not value.startswith(base):
+            problems.append(Problem("warning", where, f"key {key!r} writes {value!r}, which does not "
+                                    f"continue the {mapping[prefix]!r} written for its prefix {prefix!r}"))
+    return problems
+
+
+def to_mapping(entries: List[Entry]) -> Dict[str, str]:
+    """The mapping of a checked scheme, in table order. A repeated key keeps its first place."""
+    mapping: Dict[str, str] = {}
+    for key, value, _ in entries:
+        mapping.setdefault(key, value)
+    return mapping
+
+
+def compile_scheme(path: str, sheet: Optional[str] = None) -> Dict[str, str]:
+    """
+    Read and check a scheme file and return its mapping.
+    Raises SchemeError if the checks find errors; warnings are left to the caller.
+    """
+    entries = read_scheme(path, sheet)
+    problems = validate(entries)
+    if any(problem.level == "error" for problem in problems):
+        raise SchemeError(path, problems)
+    return to_mapping(entries)
+
+
+def add_parser(commands):
+    """Register the scheme command on the subparsers of the singlish command line."""
+    parser = commands.add_parser("scheme", help="check a transliteration scheme and compile it")
+    parser.add_argument("source", help="scheme to read: .xlsx, .csv, .json or a .py file with TRANSLITERATION_MAP")
+    parser.add_argument("-o", "--output", help="write the scheme as a precompiled .table file, or as .json")
+    parser.add_argument("--sheet", help="worksheet to read from a workbook (default: the first one)")
+    parser.add_argument("--strict", action="store_true", help="treat warnings as errors")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only report errors")
+    parser.set_defaults(handler=run)
+    return parser
+
+
+def run(args) -> int:
+    try:
+        entries = read_scheme(args.source, args.sheet)
+    except (OSError, ValueError, zipfile.BadZipFile, ElementTree.ParseError, SyntaxError) as e:
+        print(f"{args.source}: error: {e}", file=sys.stderr)
+        return 1
+    problems = validate(entries)
+    errors = sum(problem.level == "error" for problem in problems)
+    for problem in problems:
+        if problem.level == "error" or not args.quiet:
+            print(problem, file=sys.stderr)
+    if errors or (args.strict and problems):
+        print(f"{args.source}: {errors} errors, {len(problems) - errors} warnings, nothing written", file=sys.stderr)
+        return 1
+
+    mapping = to_mapping(entries)
+    if args.output:
+        if args.output.endswith(".json"):
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(mapping, file, ensure_ascii=False, indent=0)
+        else:
+            build_table(args.output, mapping)
+    print(f"{args.source}: {len(mapping)} keys, {len(problems)} warnings"
+          + (f", written to {args.output}" if args.output else ""))
+    return 0
@@ -0,0 +1,312 @@
+"""
+Transliteration server behind `python -m singlish serve`.
+
+A small HTTP/1.1 JSON server on asyncio. Requests that arrive close together are
+gathered into one batch, and every batch is transliterated in a pool of worker
+processes, so the event loop only parses requests and writes responses.
+
+    POST /transliterate  {"text": "mama"}             -> {"text": "මම"}
+    POST /transliterate  {"texts": ["mama", "oyaa"]}  -> {"texts": ["මම", "ඔයා"]}
+    POST /transliterate  mama  (Content-Type: text/plain) -> මම
+    GET  /health                                      -> {"status": "ok"}
+    GET  /metrics                                     -> counters in Prometheus text format
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from singlish import get_matcher, transliterate_bytes, transliterate_many
+
+DEFAULT_PORT = 8765
+
+# Requests arriving within this many seconds of the first one share a batch
+BATCH_DELAY = 0.002
+
+# A batch is sent off at once when it holds this many texts
+BATCH_SIZE = 1024
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+ENDPOINTS = ("/transliterate", "/health", "/metrics")
+
+REASONS = {100: "Continue", 200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 417: "Expectation Failed",
+           500: "Internal Server Error"}
+
+
+def transliterate_batch(texts: List[str]) -> List[str]:
+    """
+    Transliterate a batch of texts in a worker process. Concurrent requests often send
+    the same words, which transliterate_many() transliterates once per batch.
+    """
+    return transliterate_many(texts)
+
+
+class Batcher:
+    """
+    Collects the texts of concurrent requests into batches for the worker pool.
+    A batch is sent once it holds BATCH_SIZE texts or BATCH_DELAY after its first
+    request, whichever comes first. Batches run concurrently, one per free worker.
+    """
+
+    def __init__(self, executor: Optional[ProcessPoolExecutor], metrics: "Metrics",
+                 delay: float = BATCH_DELAY, size: int = BATCH_SIZE):
+        self.executor = executor
+        self.metrics = metrics
+        self.delay = delay
+        self.size = size
+        self.pending: List[Tuple[List[str], asyncio.Future]] = []
+        self.pending_texts = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, texts: List[str]) -> List[str]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((texts, future))
+        self.pending_texts += len(texts)
+        if self.pending_texts >= self.size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.delay, self.flush)
+        return await future
+
+    def flush(self):
+        """Send the pending requests off as one batch."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            batch, self.pending, self.pending_texts = self.pending, [], 0
+            asyncio.get_running_loop().create_task(self.run(batch))
+
+    async def run(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        self.metrics.count("singlish_batches_total")
+        self.metrics.count("singlish_batch_texts_total", len(texts))
+        try:
+            if self.executor is None:
+                results = transliterate_batch(texts)
+            else:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(self.executor, transliterate_batch, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        start = 0
+        for request_texts, future in batch:
+            end = start + len(request_texts)
+            if not future.done():
+                future.set_result(results[start:end])
+            start = end
+
+
+class Metrics:
+    """Counters exposed on /metrics."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters: Counter = Counter()
+
+    def count(self, name: str, amount: float = 1):
+        self.counters[name] += amount
+
+    def render(self, batcher: Batcher) -> str:
+        lines = [f"{name} {value:g}" for name, value in sorted(self.counters.items())]
+        lines.append(f"singlish_pending_texts {batcher.pending_texts}")
+        lines.append(f"singlish_uptime_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+class TransliterationServer:
+    """Parses HTTP requests on each connection and answers them from the batcher."""
+
+    def __init__(self, workers: int = os.cpu_count() or 1, delay: float = BATCH_DELAY,
+                 size: int = BATCH_SIZE):
+        # With no workers batches run on the event loop itself, which only suits light use
+        self.executor = ProcessPoolExecutor(workers, initializer=get_matcher) if workers > 0 else None
+        self.metrics = Metrics()
+        self.batcher = Batcher(self.executor, self.metrics, delay, size)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                if "transfer-encoding" in headers:
+                    # Chunked bodies are not read, and their framing must not be taken for
+                    # the next request, so the connection is closed
+                    await self.respond(writer, 411, {"error": "send the body with a Content-Length"}, False)
+                    break
+                length = headers.get("content-length") or "0"
+                # int() alone would also take "-1", " 1" or "1_000"
+                if not (length.isascii() and length.isdigit()):
+                    await self.respond(writer, 400, {"error": "malformed Content-Length"}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": f"body larger than {MAX_BODY} bytes"}, False)
+                    break
+                expect = headers.get("expect", "").lower()
+                if expect == "100-continue":
+                    # curl waits for this before it sends a large body
+                    if length:
+                        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                        await writer.drain()
+                elif expect:
+                    await self.respond(writer, 417, {"error": f"unsupported Expect: {expect}"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                path = target.split("?", 1)[0]
+                status, payload = await self.dispatch(method, path, body, headers.get("content-type", ""))
+                await self.respond(writer, status, payload, keep_alive)
+                endpoint = path if path in ENDPOINTS else "other"
+                self.metrics.count(f'singlish_requests_total{{path="{endpoint}",status="{status}"}}')
+                self.metrics.count("singlish_request_seconds_sum", time.perf_counter() - started)
+                self.metrics.count("singlish_request_seconds_count")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, path: str, body: bytes, content_type: str = ""):
+        """
+        Return (status, payload) for one request. A str payload is sent as plain text,
+        a bytes payload as UTF-8 text.
+        """
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics.render(self.batcher)
+        if path != "/transliterate":
+            return 404, {"error": f"no such endpoint: {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        if content_type.startswith("text/plain"):
+            return await self.dispatch_plain(body)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 400, {"error": "body is not valid JSON"}
+
+        if isinstance(request, dict) and isinstance(request.get("text"), str):
+            texts, single = [request["text"]], True
+        elif (isinstance(request, dict) and isinstance(request.get("texts"), list)
+              and all(isinstance(text, str) for text in request["texts"])):
+            texts, single = request["texts"], False
+        else:
+            return 400, {"error": 'expected {"text": "..."} or {"texts": ["...", ...]}'}
+
+        self.metrics.count("singlish_texts_total", len(texts))
+        self.metrics.count("singlish_chars_total", sum(map(len, texts)))
+        try:
+            results = await self.batcher.submit(texts) if texts else []
+        except Exception as e:
+            return 500, {"error": f"transliteration failed: {e}"}
+        return 200, {"text": results[0]} if single else {"texts": results}
+
+    async def dispatch_plain(self, body: bytes):
+        """
+        Transliterate a text/plain body as it arrived, UTF-8 bytes in and out, without
+        decoding it. A plain body is one document, so it skips the batcher.
+        """
+        self.metrics.count("singlish_texts_total")
+        self.metrics.count("singlish_plain_bytes_total", len(body))
+        try:
+            if self.executor is None:
+                return 200, transliterate_bytes(body)
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(self.executor, transliterate_bytes, body)
+        except Exception as e:
+            return 500, {"error": f"transliteration failed: {e}"}
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        if isinstance(payload, bytes):
+            body = payload
+            content_type = "text/plain; charset=utf-8"
+        elif isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"Serving on {addresses}", file=sys.stderr)
+        try:
+            # Stop cleanly on SIGTERM too, so the worker processes are shut down with us
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows has no SIGTERM handlers in asyncio
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+
+def add_parser(commands):
+    """Register the serve command on the subparsers of the singlish command line."""
+    parser = commands.add_parser("serve", help="run an HTTP/JSON transliteration server")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: all cores, 0 transliterates on the event loop)")
+    parser.add_argument("--batch-delay", type=float, default=BATCH_DELAY * 1000,
+                        help=f"milliseconds to wait for more requests to batch (default: {BATCH_DELAY * 1000:g})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"texts per batch before it is sent at once (default: {BATCH_SIZE})")
+    parser.set_defaults(handler=run)
+    return parser
+
+
+def run(args) -> int:
+    server = TransliterationServer(max(0, args.workers), args.batch_delay / 1000, max(1, args.batch_size))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
@@ -0,0 +1,325 @@
+"""
+Opt-in instrumentation for the transliteration engine and the typing window.
+
+Nothing is recorded unless the SINGLISH_TRACE environment variable names an output
+file or a program calls enable(), as `--trace FILE` does. Enabling wraps the hot
+functions in place; until then they are untouched, so a disabled trace costs nothing.
+
+Every call of a wrapped function becomes one event in a fixed size ring buffer, and
+per-stage totals (calls, time, characters) count every call, also those that have
+been pushed out of the buffer. At exit the trace is written either in the Chrome
+trace format, which chrome://tracing and https://ui.perfetto.dev open, or as plain
+JSON (SINGLISH_TRACE_FORMAT=json). Both can be summarised on the command line:
+
+    SINGLISH_TRACE=trace.json python singlish_gui_qt.py
+    python singlish_gui_qt.py --trace trace.json --trace-format json
+    python -m singlish --trace trace.json convert book.txt -o out
+    python -m singlish_trace trace.json
+
+Worker processes record into a recorder of their own. `convert -j N` sends each
+worker's events back with its results with drain() and merge(), and they show up
+as one row per worker process. The process pools of transliterate_many() and
+`serve` are not traced; use processes=1 or `serve --workers 0` to trace the engine
+calls they would make.
+"""
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Events kept in the ring buffer; older ones are dropped but still counted in the totals
+RING_SIZE = 1 << 16
+
+FORMATS = ("chrome", "json")
+
+# (stage, thread id, start ns, duration ns, characters)
+Event = Tuple[str, int, int, int, int]
+
+_recorder: Optional["Recorder"] = None
+
+# (path, format) the trace is written to at exit
+_output: Optional[Tuple[str, str]] = None
+
+
+class Recorder:
+    """Ring buffer of timed events plus running totals per stage and free-form counters."""
+
+    def __init__(self, capacity: int = RING_SIZE):
+        self.capacity = capacity
+        self.started = time.perf_counter_ns()
+        self.clear()
+
+    def clear(self):
+        """Forget every event, total and counter recorded so far."""
+        self.events: List[Optional[Event]] = [None] * self.capacity
+        # next() on a count is atomic, so threads never write the same slot
+        self._slots = itertools.count()
+        # stage -> [calls, total ns, longest ns, characters]. Threads could race on
+        # these sums, but each stage is recorded from a single thread in practice.
+        self.stages: Dict[str, List[int]] = {}
+        self.counters: Counter = Counter()
+
+    def record(self, stage: str, start: int, duration: int, chars: int = 0):
+        self.events[next(self._slots) % self.capacity] = (stage, threading.get_ident(), start, duration, chars)
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = [0, 0, 0, 0]
+        totals[0] += 1
+        totals[1] += duration
+        if duration > totals[2]:
+            totals[2] = duration
+        totals[3] += chars
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def merge(self, data: dict):
+        """Add what drain() returned in another process."""
+        for stage, (calls, total, longest, chars) in data["stages"].items():
+            totals = self.stages.get(stage)
+            if totals is None:
+                totals = self.stages[stage] = [0, 0, 0, 0]
+            totals[0] += calls
+            totals[1] += total
+            totals[2] = max(totals[2], longest)
+            totals[3] += chars
+        self.counters.update(data["counters"])
+        # perf_counter_ns() is one system-wide clock, so the start times line up
+        for event in data["events"]:
+            self.events[next(self._slots) % self.capacity] = event
+
+    def recent(self) -> List[Event]:
+        """The events still in the buffer, oldest first."""
+        end = next(self._slots)
+        start = max(0, end - self.capacity)
+        events = [self.events[slot % self.capacity] for slot in range(start, end)]
+        return [event for event in events if event is not None]
+
+    def summary(self) -> dict:
+        stages = {}
+        for stage, (calls, total, longest, chars) in sorted(self.stages.items()):
+            stages[stage] = {
+                "calls": calls,
+                "total_ms": total / 1e6,
+                "mean_us": total / calls / 1e3,
+                "max_us": longest / 1e3,
+                "chars": chars,
+            }
+        return {"stages": stages, "counters": dict(self.counters),
+                "duration_ms": (time.perf_counter_ns() - self.started) / 1e6}
+
+    def to_json(self) -> dict:
+        data = self.summary()
+        data["events"] = [{"stage": stage, "thread": thread, "start_us": (start - self.started) / 1e3,
+                           "duration_us": duration / 1e3, "chars": chars}
+                          for stage, thread, start, duration, chars in self.recent()]
+        return data
+
+    def to_chrome(self) -> dict:
+        pid = os.getpid()
+        events = [{"name": stage, "cat": stage.split(".")[0], "ph": "X", "pid": pid, "tid": thread,
+                   "ts": (start - self.started) / 1e3, "dur": duration / 1e3, "args": {"chars": chars}}
+                  for stage, thread, start, duration, chars in self.recent()]
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": threading.main_thread().ident,
+                       "args": {"name": "main"}})
+        # Viewers ignore unknown keys, so the totals travel in the same file
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": self.summary()}
+
+    def dump(self, path: str, format: str = "chrome"):
+        data = self.to_chrome() if format == "chrome" else self.to_json()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def count(name: str, amount: int = 1):
+    """Add to a counter if tracing is enabled."""
+    if _recorder is not None:
+        _recorder.count(name, amount)
+
+
+def instrument(owner, name: str, stage: str, measure: Optional[Callable] = None):
+    """
+    Time every call of owner.name as `stage`, if tracing is enabled. measure(args, result),
+    if given, returns the number of characters the call processed.
+    """
+    recorder = _recorder
+    function = getattr(owner, name)
+    if recorder is None or getattr(function, "_singlish_traced", False):
+        return
+    record = recorder.record
+    clock = time.perf_counter_ns
+    # Qt passes a slot only as many signal arguments as it takes, e.g. a clicked()
+    # handler without a `checked` parameter gets none. The wrapper takes any number,
+    # so it drops the extra ones itself.
+    code = getattr(function, "__code__", None)
+    arity = code.co_argcount if code is not None and not code.co_flags & inspect.CO_VARARGS else None
+
+    @functools.wraps(function)
+    def traced(*args, **kwargs):
+        start = clock()
+        result = function(*args[:arity], **kwargs)
+        record(stage, start, clock() - start, measure(args, result) if measure else 0)
+        return result
+
+    traced._singlish_traced = True
+    setattr(owner, name, traced)
+
+
+def _text_length(args, result):
+    return len(args[-1]) if args and isinstance(args[-1], str) else 0
+
+
+def _incremental_update(args, result):
+    # The part of the output an edit did not touch was reused, not transliterated again
+    transliterator, _ = args
+    _recorder.count("incremental.reused_chars", len(transliterator.output) - len(result[2]))
+    return len(result[2])
+
+
+def _instrument_engine():
+    import singlish
+    instrument(singlish.Matcher, "transliterate", "engine.transliterate", _text_length)
+    instrument(singlish.Matcher, "transliterate_many", "engine.transliterate_many",
+               lambda args, result: len(result))
+    instrument(singlish.Matcher, "transliterate_bytes", "engine.transliterate_bytes",
+               lambda args, result: len(args[-1]))
+    instrument(singlish.IncrementalTransliterator, "update", "engine.incremental_update", _incremental_update)
+    instrument(singlish.ReverseMatcher, "detransliterate", "engine.detransliterate", _text_length)
+    instrument(singlish.TokenCache, "transliterate", "engine.token_cache", _text_length)
+
+
+def _finish():
+    """Write the trace at exit, after folding in the counters of the TokenCaches still alive."""
+    import singlish
+    for cache in list(singlish._token_caches):
+        info = cache.cache_info()
+        count("token_cache.hits", info.hits)
+        count("token_cache.misses", info.misses)
+    _recorder.dump(*_output)
+
+
+def enable(path: Optional[str] = None, format: Optional[str] = None, capacity: int = RING_SIZE) -> Recorder:
+    """
+    Start recording and instrument the engine. If path is given the trace is written
+    there at exit, in `format` ("chrome" unless SINGLISH_TRACE_FORMAT says otherwise).
+    Enabling again only changes where the trace goes, e.g. `--trace` over SINGLISH_TRACE.
+    """
+    global _recorder, _output
+    if _recorder is None:
+        _recorder = Recorder(capacity)
+        _instrument_engine()
+    if path:
+        format = format or os.environ.get("SINGLISH_TRACE_FORMAT") or "chrome"
+        if format not in FORMATS:
+            raise ValueError(f"unknown trace format {format!r}, expected one of {', '.join(FORMATS)}")
+        if _output is None:
+            atexit.register(_finish)
+        _output = (path, format)
+    return _recorder
+
+
+def start_worker():
+    """
+    Start a worker process's own trace. A forked worker inherits the parent's events,
+    which the parent already has, so it starts over with an empty recorder.
+    """
+    if _recorder is None:
+        enable()
+    else:
+        # The inherited methods are already wrapped and record into this recorder
+        _recorder.clear()
+
+
+def drain() -> Optional[dict]:
+    """
+    Return what this worker process recorded since the last call, for the parent to
+    merge(). Events carry the worker's process id as their thread, so each worker
+    gets a row of its own in trace viewers.
+    """
+    if _recorder is None:
+        return None
+    pid = os.getpid()
+    data = {"stages": _recorder.stages, "counters": dict(_recorder.counters),
+            "events": [(stage, pid, start, duration, chars)
+                       for stage, _, start, duration, chars in _recorder.recent()]}
+    _recorder.clear()
+    return data
+
+
+def merge(data: Optional[dict]):
+    """Fold a worker's drain() into this process's trace, if tracing is enabled."""
+    if _recorder is not None and data:
+        _recorder.merge(data)
+
+
+def enable_from_environment() -> Optional[Recorder]:
+    """
+    Enable tracing if SINGLISH_TRACE names an output file; importing singlish calls
+    this. Worker processes inherit the variable but leave the file to their parent.
+    """
+    import multiprocessing
+    path = os.environ.get("SINGLISH_TRACE")
+    if not path or multiprocessing.parent_process() is not None:
+        return None
+    return enable(path)
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def report(data: dict, slowest: int = 10) -> str:
+    """Render a trace written by Recorder.dump() in either format as a text table."""
+    if "traceEvents" in data:
+        summary = data.get("otherData", {})
+        events = [(event["name"], event["dur"]) for event in data["traceEvents"] if event.get("ph") == "X"]
+    else:
+        summary = data
+        events = [(event["stage"], event["duration_us"]) for event in data.get("events", [])]
+    durations: Dict[str, List[float]] = {}
+    for stage, duration in events:
+        durations.setdefault(stage, []).append(duration)
+
+    lines = [f"{'stage':<28} {'calls':>9} {'total ms':>10} {'mean us':>10} {'p50 us':>10} "
+             f"{'p99 us':>10} {'max us':>10} {'chars/s':>14}"]
+    for stage, totals in sorted(summary.get("stages", {}).items(), key=lambda item: -item[1]["total_ms"]):
+        recent = sorted(durations.get(stage, []))
+        p50 = f"{_percentile(recent, 0.50):>10,.1f}" if recent else f"{'-':>10}"
+        p99 = f"{_percentile(recent, 0.99):>10,.1f}" if recent else f"{'-':>10}"
+        rate = totals["chars"] / (totals["total_ms"] / 1e3) if totals["chars"] and totals["total_ms"] else 0
+        lines.append(f"{stage:<28} {totals['calls']:>9,} {totals['total_ms']:>10,.1f} {totals['mean_us']:>10,.1f} "
+                     f"{p50} {p99} {totals['max_us']:>10,.1f} {rate:>14,.0f}")
+    for name, value in sorted(summary.get("counters", {}).items()):
+        lines.append(f"{name:<28} {value:>9,}")
+    if slowest and events:
+        lines.append("")
+        lines.append(f"slowest of the {len(events):,} recorded calls:")
+        for stage, duration in sorted(events, key=lambda event: -event[1])[:slowest]:
+            lines.append(f"  {duration:>12,.1f} us  {stage}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m singlish_trace", description="Summarise a singlish trace file.")
+    parser.add_argument("trace", help="file written with SINGLISH_TRACE or --trace")
+    parser.add_argument("--slowest", type=int, default=10, help="slowest calls to list (default: 10)")
+    args = parser.parse_args(argv)
+    with open(args.trace, encoding="utf-8") as file:
+        print(report(json.load(file), args.slowest))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
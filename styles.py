@@ -134,3 +134,57 @@ QPushButton#title_bar_button {
 QPushButton#title_bar_button_close:hover { background-color: #F70000; }
 QPushButton#title_bar_button:hover { background-color: #444444; }
 """
+
+# Popup shown after copying text
+LIGHT_MODE_POPUP_STYLE = """
+QLabel {
+    background-color: #E0E0E0; color: black;
+    border-radius: 5px; padding: 10px;
+}
+"""
+DARK_MODE_POPUP_STYLE = """
+QLabel {
+    background-color: #444444; color: white;
+    border-radius: 5px; padding: 10px;
+}
+"""
+
+# Help dialog
+LIGHT_MODE_MESSAGE_BOX_STYLE = """
+QMessageBox {
+    background-color: #FDFDFD; color: black;
+}
+QPushButton {
+    background-color: #E0E0E0; color: black; border: 2px solid #D0D0D0;
+    border-radius: 5px; padding: 5px 10px;
+}
+QPushButton:hover {
+    background-color: #D0D0D0;
+}
+a { color: #1a73e8; }
+"""
+DARK_MODE_MESSAGE_BOX_STYLE = """
+QMessageBox {
+    background-color: #202020; color: white;
+}
+QPushButton {
+    background-color: #444444; color: white; border: 2px solid #555555;
+    border-radius: 5px; padding: 5px 10px;
+}
+QPushButton:hover {
+    background-color: #555555;
+}
+a { color: #8ab4f8; }
+"""
+
+# History window: the main styles plus a border around the frameless window
+LIGHT_MODE_HISTORY_STYLE = """
+QWidget#main_widget_container {
+    border: 2px solid black;
+}
+""" + LIGHT_MODE_STYLE
+DARK_MODE_HISTORY_STYLE = """
+QWidget#main_widget_container {
+    border: 2px solid white;
+}
+""" + DARK_MODE_STYLE